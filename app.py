@@ -1,166 +1,1031 @@
-from flask import Flask, request, jsonify, send_file
-import pandas as pd
+from flask import Flask, Request, request, jsonify, send_file, send_from_directory
 import re
 import os
 import tempfile
-from openpyxl import load_workbook
-from openpyxl.utils import get_column_letter
-from io import BytesIO
-from datetime import datetime
+from io import BytesIO, RawIOBase, StringIO
+import csv
 import json
 import sys
+import threading
+import importlib.util
+import functools
+import hmac
+import multiprocessing
+import hashlib
+import time
+import tracemalloc
+import zlib
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from lazy_modules import lazy_import
+from metrics import BYTES_BUCKETS, ROWS_BUCKETS, SECONDS_BUCKETS, Histogram, render_samples
+from profiler import SamplingProfiler
+from result_index import ResultIndex
+from result_store import create_result_store, start_sweeper
+from xlsx_stream import stream_xlsx
+
+# 第一次处理或下载文件时才导入（见 lazy_modules），可以用 /warmup 提前导入
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+openpyxl = lazy_import('openpyxl')
+
+# 上传文件在内存中保存的最大字节数，超过后才写入匿名临时文件
+UPLOAD_SPOOL_BYTES = int(os.environ.get('UPLOAD_SPOOL_BYTES', 16 * 1024 * 1024))
+
+
+class UploadRequest(Request):
+    """上传文件保存在 SpooledTemporaryFile 中：小文件完全在内存里处理，大文件溢出到匿名临时文件"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES, mode='rb+')
+
 
 app = Flask(__name__)
+app.request_class = UploadRequest
+
+# 处理结果存储：memory（进程内）、sqlite 或 directory（多个worker共享）
+RESULT_STORE = os.environ.get('RESULT_STORE', 'memory')
+RESULT_STORE_PATH = os.environ.get('RESULT_STORE_PATH')
+RESULT_TTL = int(os.environ.get('RESULT_TTL', 24 * 3600))  # 结果多久没有访问后过期（秒）
+RESULT_STORE_MAX_BYTES = int(os.environ.get('RESULT_STORE_MAX_BYTES', 512 * 1024 * 1024))
+
+RESULT_SWEEP_INTERVAL = int(os.environ.get('RESULT_SWEEP_INTERVAL', 60))  # 后台清理间隔（秒）
 
 # Vercel环境适配
 if os.environ.get('VERCEL'):
-    # 在Vercel上使用内存存储，但添加清理机制
-    from collections import OrderedDict
+    # 在Vercel上使用内存存储，最多存储10个处理结果
+    result_store = create_result_store('memory', ttl=RESULT_TTL, max_bytes=RESULT_STORE_MAX_BYTES, max_entries=10)
+else:
+    result_store = create_result_store(RESULT_STORE, RESULT_STORE_PATH, RESULT_TTL, RESULT_STORE_MAX_BYTES)
 
-    processed_data_store = OrderedDict()
-    MAX_STORE_SIZE = 10  # 最多存储10个处理结果
+# 后台定期清理，长时间运行时内存和磁盘占用保持平稳
+result_store_sweeper = start_sweeper(result_store, RESULT_SWEEP_INTERVAL)
 
+# 规格名称解析用到的正则，预编译一次，逐行函数和向量化函数共用
+# 颜色：开头不包含数字和字母的部分；其余为尺寸
+SPEC_SPLIT_PATTERN = re.compile(r'^([^A-Za-z0-9]*)(.*)', re.S)
 
-    def cleanup_store():
-        if len(processed_data_store) > MAX_STORE_SIZE:
-            # 移除最旧的项目
-            processed_data_store.popitem(last=False)
-else:
-    # 本地开发使用普通字典
-    processed_data_store = {}
+# 尺寸中的时间标记（如"48小时内发货"）规则表：名称 + 正则
+# 新的时间标记直接加到规则表里，或通过 SHIPPING_TAG_RULES_FILE 指定JSON规则文件，不需要改代码
+DEFAULT_SHIPPING_TAG_RULES = [
+    {'name': '48小时内发货', 'pattern': r'\s*48小时内发货\s*'},
+    {'name': '分号', 'pattern': r'\s*;\s*'},
+    {'name': '72小时内发货', 'pattern': r'\s*72小时内发货\s*'},
+    {'name': '一周内发货', 'pattern': r'\s*一周内发货\s*'},
+    {'name': 'N天内发货', 'pattern': r'\d+\s*天内发货\s*'},
+]
+
+
+def load_shipping_tag_rules():
+    """读取时间标记规则表，设置了 SHIPPING_TAG_RULES_FILE 时从该JSON文件读取"""
+    rules_file = os.environ.get('SHIPPING_TAG_RULES_FILE')
+    if rules_file:
+        with open(rules_file, encoding='utf-8') as f:
+            return json.load(f)
+    return DEFAULT_SHIPPING_TAG_RULES
 
 
-def process_excel_data(file_path):
+def compile_shipping_tag_rules(rules):
     """
-    直接处理Excel文件，按照指定尺寸顺序排序，并去除时间标记
+    把规则表编译成一个交替正则，每条规则对应一个命名分组
+    无论有多少条规则，每个值只需要扫描一遍
+    """
+    if not rules:
+        return re.compile(r'(?!)')  # 没有规则时不匹配任何内容
+    return re.compile('|'.join(f'(?P<tag{i}>{rule["pattern"]})' for i, rule in enumerate(rules)))
+
+
+SHIPPING_TAG_RULES = load_shipping_tag_rules()
+SHIPPING_TAG_PATTERN = compile_shipping_tag_rules(SHIPPING_TAG_RULES)
+
+# 每条规则的命中次数（按解析过的不同规格名称统计），用于查看实际出现了哪些时间标记
+shipping_tag_hits = Counter()
+shipping_tag_hits_lock = threading.Lock()
+
+
+def set_shipping_tag_rules(rules):
+    """替换时间标记规则表，重新编译正则并清空已解析规格名称的缓存"""
+    global SHIPPING_TAG_RULES, SHIPPING_TAG_PATTERN
+    SHIPPING_TAG_RULES = rules
+    SHIPPING_TAG_PATTERN = compile_shipping_tag_rules(rules)
+    with shipping_tag_hits_lock:
+        shipping_tag_hits.clear()
+    with spec_name_cache_lock:
+        spec_name_cache.clear()
+
+
+def make_tag_remover(hits):
+    """生成 re.sub 用的替换函数：去除匹配到的时间标记，并把命中的规则累加到hits"""
+    def remove_tag(match):
+        hits[match.lastgroup] += 1
+        return ''
+
+    return remove_tag
+
+
+def record_shipping_tag_hits(hits):
+    """把一次解析中的命中次数合并到全局计数器，键从分组名换成规则名称"""
+    if not hits:
+        return
+    with shipping_tag_hits_lock:
+        for group, count in hits.items():
+            shipping_tag_hits[SHIPPING_TAG_RULES[int(group[3:])]['name']] += count
+
+
+# 标准化尺寸：将"M 1"改为"M"，只取开头的字母部分
+SIZE_LETTER_PATTERN = re.compile(r'^([A-Za-z]+)')
+
+
+def extract_color_size(name):
+    """从规格名称中提取颜色和尺寸（逐行版本）"""
+    # 提取不包含数字和字母的部分作为颜色
+    color = SPEC_SPLIT_PATTERN.match(str(name)).group(1).strip()  # 去除前后空格
+    size = name[len(color):].strip()  # 去除前后空格
+    return color, size
+
+
+def clean_size(size_str):
+    """去除尺寸中的时间标记（逐行版本）"""
+    hits = Counter()
+    cleaned_size = SHIPPING_TAG_PATTERN.sub(make_tag_remover(hits), str(size_str))
+    record_shipping_tag_hits(hits)
+    return cleaned_size.strip()
+
+
+def normalize_size(size_str):
+    """标准化尺寸格式（逐行版本）"""
+    size_str = str(size_str).strip()
+    size_match = SIZE_LETTER_PATTERN.match(size_str)
+    if size_match:
+        return size_match.group(1).upper()  # 返回大写的尺寸字母
+    return size_str
+
+
+def parse_spec_names_vectorized(names):
+    """
+    向量化解析规格名称，返回包含 颜色、尺寸、标准化尺寸 三列的DataFrame
+    结果与逐行调用 extract_color_size / clean_size / normalize_size 完全一致
+    """
+    names = names.astype(str)
+
+    # 拆分颜色和尺寸
+    parts = names.str.extract(SPEC_SPLIT_PATTERN)
+    prefix = parts[0]
+    color = prefix.str.strip()
+    size = parts[1].str.strip()
+
+    # 颜色部分以空白开头时，原逻辑按去空格后的颜色长度截取尺寸，这里逐个保持一致
+    leading_space = prefix != prefix.str.lstrip()
+    if leading_space.any():
+        size[leading_space] = [
+            name[len(c):].strip()
+            for name, c in zip(names[leading_space], color[leading_space])
+        ]
+
+    # 去除尺寸中的时间标记
+    hits = Counter()
+    size = size.str.replace(SHIPPING_TAG_PATTERN, make_tag_remover(hits), regex=True)
+    record_shipping_tag_hits(hits)
+    size = size.str.strip()
+
+    # 标准化尺寸
+    normalized = size.str.extract(SIZE_LETTER_PATTERN)[0].str.upper().fillna(size)
+
+    return pd.DataFrame({'颜色': color, '尺寸': size, '标准化尺寸': normalized}, index=names.index)
+
+
+# 已解析规格名称的进程级LRU缓存：规格名称 -> (颜色, 尺寸, 标准化尺寸)
+# 同一批商品反复上传时可以完全跳过解析
+SPEC_CACHE_SIZE = int(os.environ.get('SPEC_CACHE_SIZE', 50000))
+spec_name_cache = OrderedDict()
+spec_name_cache_lock = threading.Lock()
+
+
+def parse_spec_names(names):
+    """
+    解析规格名称，每个不同的规格名称只解析一次
+    先把规格名称因子化为唯一值，未命中缓存的唯一值统一向量化解析，再按整数编码映射回每一行
+    """
+    report_progress('parse')
+    names = names.astype(str)
+    codes, uniques = pd.factorize(names)
+
+    parsed = [None] * len(uniques)
+    missing = []
+    with spec_name_cache_lock:
+        for i, name in enumerate(uniques):
+            triple = spec_name_cache.get(name)
+            if triple is None:
+                missing.append(i)
+            else:
+                spec_name_cache.move_to_end(name)
+                parsed[i] = triple
+
+    if missing:
+        missing_names = pd.Series([uniques[i] for i in missing], dtype=object)
+        result = parse_spec_names_vectorized(missing_names)
+        triples = list(zip(result['颜色'], result['尺寸'], result['标准化尺寸']))
+        with spec_name_cache_lock:
+            for i, triple in zip(missing, triples):
+                parsed[i] = triple
+                spec_name_cache[uniques[i]] = triple
+            # 超出容量时移除最久未使用的项目
+            while len(spec_name_cache) > SPEC_CACHE_SIZE:
+                spec_name_cache.popitem(last=False)
+
+    # 每列的唯一值再因子化一次（类别按文本排序，与分组排序一致），
+    # 通过整数编码直接得到category类型的列，不再为每一行生成字符串对象
+    unique_df = pd.DataFrame(parsed, columns=['颜色', '尺寸', '标准化尺寸'], dtype=object)
+    columns = {}
+    for column in unique_df.columns:
+        value_codes, categories = pd.factorize(unique_df[column], sort=True)
+        columns[column] = pd.Categorical.from_codes(value_codes[codes], categories)
+    return pd.DataFrame(columns, index=names.index)
+
+
+# 处理时用到的列
+SPEC_COLUMNS = ['规格编码', '规格名称', '规格数量']
+
+# 分组汇总的键，整个汇总过程中保持category类型
+GROUP_KEYS = ['规格编码', '颜色', '标准化尺寸']
+
+
+def convert_cell_value(value):
+    """与 pd.read_excel 保持一致：整数值的浮点数转换为整数"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def spec_column_positions(header):
+    """在表头行中查找 (规格编码, 规格名称, 规格数量) 三列的位置"""
+    header = [str(value) if value is not None else None for value in header]
+    missing = [column for column in SPEC_COLUMNS if column not in header]
+    if missing:
+        raise ValueError(f"缺少必要的列: {'、'.join(missing)}")
+    return [header.index(column) for column in SPEC_COLUMNS]
+
+
+def iter_worksheet_spec_rows(worksheet):
+    """逐行读取工作表，只返回 (规格编码, 规格名称, 规格数量)；缺失值文本（如 NA）与 pd.read_excel 一致视为空值"""
+    rows = worksheet.iter_rows(values_only=True)
+    positions = spec_column_positions(next(rows, ()))
+    for row in rows:
+        yield tuple(
+            missing_to_none(convert_cell_value(row[position])) if position < len(row) else None
+            for position in positions
+        )
+
+
+def iter_spec_rows_xlsx(source):
+    """
+    用openpyxl只读模式逐行读取第一个工作表，只返回 (规格编码, 规格名称, 规格数量)
+    三列的位置从表头行查找，不会把整张表加载到内存
+    """
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        yield from iter_worksheet_spec_rows(workbook.worksheets[0])
+    finally:
+        workbook.close()
+
+
+def aggregate_spec_rows(rows):
+    """
+    边读边汇总：先按 (规格编码, 规格名称) 累加数量，再把每个不同的规格名称解析一次，
+    折叠为 (规格编码, 颜色, 标准化尺寸) -> 数量，内存只与不同SKU的数量有关，与行数无关
     """
-    # 读取Excel文件
-    df = pd.read_excel(file_path)
-
-    # 从规格名称中提取颜色和尺寸
-    def extract_color_size(name):
-        # 提取不包含数字和字母的部分作为颜色
-        color_match = re.match(r'[^A-Za-z0-9]*', str(name))
-        if color_match:
-            color = color_match.group(0).strip()  # 去除前后空格
-            size = name[len(color):].strip()  # 去除前后空格
-            return color, size
-        return '', name.strip()  # 返回空字符串作为颜色，原始名称作为尺寸
-
-    # 分离颜色和尺寸
-    df[['颜色', '尺寸']] = df['规格名称'].apply(
-        lambda x: pd.Series(extract_color_size(x))
+    name_totals = {}
+    source_rows = 0
+    blank_codes = False
+    for code, name, quantity in rows:
+        source_rows += 1
+        # 规格编码为空的行不参与分组（与groupby丢弃空值一致）
+        if code is None:
+            blank_codes = True
+            continue
+        # 空的规格名称与 astype(str) 后的结果保持一致
+        key = (code, 'nan' if name is None else str(name))
+        name_totals[key] = name_totals.get(key, 0) + (quantity if quantity is not None else 0)
+
+    # 与 pd.read_excel 推断的列类型一致：全是数字的规格编码列中有空值或小数时整列为浮点数，
+    # 读完后只按不重复的 (规格编码, 规格名称) 转换
+    if is_float_column(list(dict.fromkeys(code for code, _ in name_totals)), blank_codes):
+        float_totals = {}
+        for (code, name), quantity in name_totals.items():
+            key = (float(code), name)
+            float_totals[key] = float_totals.get(key, 0) + quantity
+        name_totals = float_totals
+
+    names = pd.Series(list(dict.fromkeys(name for _, name in name_totals)), dtype=object)
+    parsed = parse_spec_names(names)
+    spec_lookup = dict(zip(names, zip(parsed['颜色'], parsed['标准化尺寸'])))
+
+    report_progress('aggregate')
+    totals = {}
+    for (code, name), quantity in name_totals.items():
+        color, normalized = spec_lookup[name]
+        key = (code, color, normalized)
+        totals[key] = totals.get(key, 0) + quantity
+    return totals_frame(totals, source_rows)
+
+
+def totals_frame(totals, source_rows):
+    """(规格编码, 颜色, 标准化尺寸) -> 数量 转换为与DataFrame路径相同排序和类型的分组结果"""
+    grouped = pd.DataFrame(
+        [key + (quantity,) for key, quantity in totals.items()],
+        columns=['规格编码', '颜色', '标准化尺寸', '规格数量']
     )
+    grouped = grouped.astype({column: 'category' for column in GROUP_KEYS})
+    grouped = grouped.groupby(GROUP_KEYS, observed=True)['规格数量'].sum().reset_index()
+    grouped.attrs['source_rows'] = source_rows
+    return grouped
+
+
+def group_spec_frame(df):
+    """解析DataFrame中的规格名称，并按 (规格编码, 颜色, 标准化尺寸) 分组汇总数量"""
+    # 解析规格名称：一次性得到颜色、尺寸和标准化尺寸
+    df[['颜色', '尺寸', '标准化尺寸']] = parse_spec_names(df['规格名称'])
 
-    # 去除尺寸中的时间标记（如"48小时内发货"）
-    def clean_size(size_str):
-        # 使用正则表达式去除时间标记
-        cleaned_size = re.sub(r'\s*48小时内发货\s*', '', str(size_str))
-        cleaned_size = re.sub(r'\s*;\s*', '', cleaned_size)
-        cleaned_size = re.sub(r'\s*72小时内发货\s*', '', cleaned_size)
-        cleaned_size = re.sub(r'\s*一周内发货\s*', '', cleaned_size)
-        cleaned_size = re.sub(r'\d+\s*天内发货\s*', '', cleaned_size)
-        # 可以继续添加其他时间标记的正则表达式
-        return cleaned_size.strip()
-
-    df['尺寸'] = df['尺寸'].apply(clean_size)
-
-    # 标准化尺寸格式：将"M 1"改为"M"，统一尺寸表示
-    def normalize_size(size_str):
-        # 提取尺寸部分（字母部分）
-        size_match = re.match(r'([A-Za-z]+)\s*\d*', str(size_str).strip())
-        if size_match:
-            return size_match.group(1).upper()  # 返回大写的尺寸字母
-        return str(size_str).strip()
-
-    df['标准化尺寸'] = df['尺寸'].apply(normalize_size)
+    # 分组键使用category类型，分组时只比较整数编码
+    df['规格编码'] = df['规格编码'].astype('category')
 
     # 分组汇总 - 使用标准化后的尺寸确保相同尺寸正确分组
-    grouped = df.groupby(['规格编码', '颜色', '标准化尺寸'])['规格数量'].sum().reset_index()
-
-    # 修正尺寸格式
-    def format_size_quantity(row):
-        size = str(row['标准化尺寸']).strip()
-        quantity = int(row['规格数量'])
-
-        # 返回格式：尺寸*数量
-        return f"{size}*{quantity}"
-
-    grouped['尺寸数量'] = grouped.apply(format_size_quantity, axis=1)
-
-    # 定义尺寸顺序
-    size_order = ['S', 'M', 'L', 'XL', '2XL', '3XL', '4XL', '5XL', '6XL']
-
-    # 按照指定尺寸顺序排序，并合并相同尺寸
-    def sort_and_merge_sizes(size_quantity_list):
-        # 创建字典来合并相同尺寸的数量
-        size_quantity_dict = {}
-
-        for item in size_quantity_list:
-            if not item:
-                continue
-
-            # 解析尺寸和数量
-            parts = item.split('*')
-            if len(parts) == 2:
-                size = parts[0].strip()
-                try:
-                    quantity = int(parts[1])
-
-                    # 合并相同尺寸的数量
-                    if size in size_quantity_dict:
-                        size_quantity_dict[size] += quantity
-                    else:
-                        size_quantity_dict[size] = quantity
-                except ValueError:
-                    # 如果数量不是数字，跳过此项
-                    continue
-
-        # 重新生成合并后的项目
-        merged_items = [f"{size}*{quantity}" for size, quantity in size_quantity_dict.items()]
-
-        # 创建排序键：按照size_order中的索引排序，不在顺序中的放在最后
-        def get_sort_key(item):
-            size_match = re.match(r'([^*]+)', item)
-            if size_match:
-                size = size_match.group(1).strip()
-                if size in size_order:
-                    return size_order.index(size)
-            return len(size_order)  # 不在顺序中的放在最后
-
-        # 按照尺寸顺序排序
-        sorted_items = sorted(merged_items, key=get_sort_key)
-
-        # 使用中文逗号连接
-        if len(sorted_items) > 1:
-            result = '，'.join(sorted_items)
-        else:
-            result = ''.join(sorted_items)
-
-        return result
-
-    # 生成最终结果
-    result_df = grouped.groupby(['规格编码', '颜色'])['尺寸数量'].apply(
-        lambda x: sort_and_merge_sizes(x.tolist())
-    ).reset_index()
-
-    result_df['结果'] = result_df['规格编码'] + '-' + result_df['颜色'] + '-' + result_df['尺寸数量']
+    report_progress('aggregate')
+    grouped = df.groupby(GROUP_KEYS, observed=True)['规格数量'].sum().reset_index()
+    # 读取的原始行数，批量处理时按文件统计
+    grouped.attrs['source_rows'] = len(df)
+    return grouped
+
+
+def read_with_openpyxl(source):
+    """pandas默认方式读取xlsx（openpyxl完整模式）"""
+    return group_spec_frame(pd.read_excel(source, engine='openpyxl', usecols=SPEC_COLUMNS))
+
+
+def read_with_openpyxl_readonly(source):
+    """openpyxl只读模式逐行读取并即时汇总，内存只与不同SKU的数量有关"""
+    return aggregate_spec_rows(iter_spec_rows_xlsx(source))
+
+
+def read_with_calamine(source):
+    """使用Rust实现的calamine引擎读取Excel（需要安装 python-calamine），同时支持xlsx和xls"""
+    return group_spec_frame(pd.read_excel(source, engine='calamine', usecols=SPEC_COLUMNS))
+
+
+def read_csv_file(source, sep):
+    """用pandas的C解析器读取CSV/TSV，ERP导出的文件可能是UTF-8或GBK编码"""
+    options = {
+        'sep': sep,
+        'usecols': SPEC_COLUMNS,
+        # 规格编码和规格名称按文本读取，保留编码开头的0
+        'dtype': {'规格编码': str, '规格名称': str},
+        'engine': 'c',
+    }
+    try:
+        df = pd.read_csv(source, encoding='utf-8-sig', **options)
+    except UnicodeDecodeError:
+        df = pd.read_csv(rewind(source), encoding='gb18030', **options)
+    return group_spec_frame(df)
+
+
+def read_with_csv(source):
+    """读取逗号分隔的CSV文件"""
+    return read_csv_file(source, ',')
+
+
+def read_with_tsv(source):
+    """读取制表符分隔的TSV文件"""
+    return read_csv_file(source, '\t')
+
+
+# 读取引擎：引擎名称 -> 读取并分组汇总的函数
+READER_ENGINES = {
+    'openpyxl': read_with_openpyxl,
+    'openpyxl_readonly': read_with_openpyxl_readonly,
+    'calamine': read_with_calamine,
+    'csv': read_with_csv,
+    'tsv': read_with_tsv,
+}
+
+# 超过这个大小的xlsx文件自动改用更快的引擎（字节）
+LARGE_FILE_BYTES = int(os.environ.get('LARGE_FILE_BYTES', 1024 * 1024))
+
+# 支持上传的文件扩展名
+ALLOWED_EXTENSIONS = ('.xlsx', '.xls', '.csv', '.tsv', '.txt')
+
+
+def calamine_available():
+    """是否安装了 python-calamine"""
+    return importlib.util.find_spec('python_calamine') is not None
+
+
+def rewind(source):
+    """文件对象回到开头后返回，文件路径原样返回"""
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return source
+
+
+def read_head(source, length):
+    """读取文件开头的若干字节和文件总大小，source可以是文件路径或二进制文件对象"""
+    if hasattr(source, 'read'):
+        head = rewind(source).read(length)
+        size = source.seek(0, os.SEEK_END)
+        rewind(source)
+        return head, size
+    with open(source, 'rb') as f:
+        return f.read(length), os.path.getsize(source)
+
+
+def detect_reader_engine(source):
+    """
+    根据文件头和文件大小自动选择读取引擎：
+    xlsx小文件用openpyxl，大文件优先用calamine，没有安装时用openpyxl只读模式；
+    xls只能用calamine；其余按表头行中的分隔符识别为CSV或TSV
+    """
+    head, size = read_head(source, 4096)
+
+    if head.startswith(b'PK\x03\x04'):
+        if size < LARGE_FILE_BYTES:
+            return 'openpyxl'
+        return 'calamine' if calamine_available() else 'openpyxl_readonly'
+
+    if head.startswith(b'\xd0\xcf\x11\xe0'):
+        if calamine_available():
+            return 'calamine'
+        raise ValueError('读取.xls文件需要安装python-calamine，请另存为.xlsx后再上传')
+
+    first_line = head.split(b'\n', 1)[0]
+    return 'tsv' if first_line.count(b'\t') > first_line.count(b',') else 'csv'
+
+
+# 纯Python引擎：日常的备货单大多只有几百行，构建DataFrame和两次groupby的固定开销比实际的计算还多
+# 数据行数不超过 PYTHON_ENGINE_ROWS 的文件自动改用字典完成解析、分组和汇总，0 表示不使用
+PYTHON_ENGINE_ROWS = int(os.environ.get('PYTHON_ENGINE_ROWS', 2000))
+
+# pandas 读取文件时默认识别为缺失值的文本，纯Python引擎按同样的规则处理
+DEFAULT_NA_VALUES = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+])
+
+
+def missing_to_none(value):
+    """与 pandas 读取文件时一致：缺失值文本（如 NA、null）视为空值"""
+    if isinstance(value, str) and value in DEFAULT_NA_VALUES:
+        return None
+    return value
+
+
+def is_float_column(present, has_missing):
+    """
+    pandas 是否把这一列推断为浮点数：present 为列中的非空值，has_missing 为列中是否有空值
+    全是数字的列中有空值或小数时整列为浮点数（规格编码 1 变成 1.0）
+    """
+    numeric = all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present)
+    return bool(present) and numeric and (has_missing or any(isinstance(value, float) for value in present))
+
+
+def pandas_like_column(values):
+    """与 pandas 推断的列类型一致：需要时整列转换为浮点数（见 is_float_column），其余情况保持原值"""
+    present = [value for value in values if value is not None]
+    if is_float_column(present, len(present) < len(values)):
+        return [float(value) if value is not None else None for value in values]
+    return values
+
+
+def read_xlsx_rows(source, max_rows=None):
+    """读取xlsx的 (规格编码, 规格名称, 规格数量) 行；工作表记录的行数超过 max_rows 时不读取，返回None"""
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        worksheet = workbook.worksheets[0]
+        if max_rows is not None and (worksheet.max_row or 0) - 1 > max_rows:
+            return None
+        rows = list(iter_worksheet_spec_rows(worksheet))
+    finally:
+        workbook.close()
+
+    columns = [pandas_like_column(list(column)) for column in zip(*rows)]
+    return list(zip(*columns))
+
+
+def parse_number(text):
+    """把CSV中的数量文本转换为数字，与 pandas 的类型推断一致：整数为int，其余为float"""
+    if text is None:
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        try:
+            return float(text)
+        except ValueError:
+            raise ValueError(f'规格数量不是数字: {text}') from None
+
+
+def read_text_rows(source, sep, max_rows=None):
+    """
+    用csv模块读取CSV/TSV的 (规格编码, 规格名称, 规格数量) 行，编码与 read_csv_file 相同（UTF-8 或 GBK）
+    换行符数量超过 max_rows 时不解析，返回None
+    """
+    if hasattr(source, 'read'):
+        data = rewind(source).read()
+    else:
+        with open(source, 'rb') as f:
+            data = f.read()
+    if max_rows is not None and data.count(b'\n') - 1 > max_rows:
+        return None
+    try:
+        text = data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        text = data.decode('gb18030')
+
+    rows = csv.reader(StringIO(text, newline=''), delimiter=sep)
+    positions = spec_column_positions(next(rows, ()))
+    spec_rows = []
+    for row in rows:
+        # 与 pandas 一致跳过空行
+        if not row:
+            continue
+        code, name, quantity = (missing_to_none(row[position]) if position < len(row) else None
+                                for position in positions)
+        spec_rows.append((code, name, parse_number(quantity)))
+    return spec_rows
+
+
+# 纯Python引擎支持的文件类型：自动识别出的引擎 -> 读取函数
+PYTHON_ENGINE_READERS = {
+    'openpyxl': read_xlsx_rows,
+    'csv': lambda source, max_rows=None: read_text_rows(source, ',', max_rows),
+    'tsv': lambda source, max_rows=None: read_text_rows(source, '\t', max_rows),
+}
+
+
+def parse_spec_name_list(names):
+    """纯Python版本的 parse_spec_names：names 为不重复的规格名称，返回 规格名称 -> (颜色, 尺寸, 标准化尺寸)"""
+    report_progress('parse')
+    parsed = {}
+    missing = []
+    with spec_name_cache_lock:
+        for name in names:
+            triple = spec_name_cache.get(name)
+            if triple is None:
+                missing.append(name)
+            else:
+                spec_name_cache.move_to_end(name)
+                parsed[name] = triple
+
+    for name in missing:
+        color, size = extract_color_size(name)
+        size = clean_size(size)
+        parsed[name] = (color, size, normalize_size(size))
+
+    if missing:
+        with spec_name_cache_lock:
+            for name in missing:
+                spec_name_cache[name] = parsed[name]
+            while len(spec_name_cache) > SPEC_CACHE_SIZE:
+                spec_name_cache.popitem(last=False)
+    return parsed
+
+
+def aggregate_spec_rows_python(rows):
+    """纯Python版本的分组汇总：返回 (规格编码, 颜色, 标准化尺寸) -> 数量"""
+    name_totals = {}
+    for code, name, quantity in rows:
+        # 规格编码为空的行不参与分组，空的规格名称与 astype(str) 后的结果保持一致
+        if code is None:
+            continue
+        key = (code, 'nan' if name is None else str(name))
+        name_totals[key] = name_totals.get(key, 0) + (quantity if quantity is not None else 0)
+
+    parsed = parse_spec_name_list(dict.fromkeys(name for _, name in name_totals))
+
+    report_progress('aggregate')
+    totals = {}
+    for (code, name), quantity in name_totals.items():
+        color, _, normalized = parsed[name]
+        key = (code, color, normalized)
+        totals[key] = totals.get(key, 0) + quantity
+    return totals
+
+
+def group_sort_key(key):
+    """与 pandas 的分组排序一致：数字和文本混在一起的规格编码，数字排在前面"""
+    code = key[0]
+    return (isinstance(code, str), code) + key[1:]
+
+
+def summarize_totals(totals, size_order=None):
+    """
+    纯Python版本的 summarize_groups：按 (规格编码, 颜色) 合并尺寸，每组按尺寸顺序方案排序后拼接
+    返回与 summarize_groups 相同的汇总结果
+    """
+    keys = sorted(totals, key=group_sort_key)
+    code_profiles = {code: size_order or size_order_for_code(code) for code, _, _ in keys}
+    profile_sizes = {}
+    for code, _, normalized in keys:
+        profile_sizes.setdefault(code_profiles[code], set()).add(str(normalized).strip())
+    rank_tables = {profile: rank_sizes(profile, sizes) for profile, sizes in profile_sizes.items()}
+
+    groups = {}
+    for key in keys:
+        code, color, normalized = key
+        size = str(normalized).strip()
+        groups.setdefault((code, color), []).append(
+            (rank_tables[code_profiles[code]][size], f'{size}*{int(totals[key])}')
+        )
+
+    report_progress('render')
+    rows = []
+    for (code, color), items in groups.items():
+        size_quantities = '，'.join(item for _, item in sorted(items, key=lambda item: item[0]))
+        rows.append((code, color, size_quantities, f'{code}-{color}-{size_quantities}'))
+
+    # 只在最后构建一次结果表，结果存储、分页和导出都使用DataFrame
+    result_df = pd.DataFrame(rows, columns=['规格编码', '颜色', '尺寸数量', '结果'])
+    for column in ['规格编码', '颜色']:
+        result_df[column] = result_df[column].astype('category')
+    return result_df
+
+
+def process_with_python(source, file_engine, size_order=None, max_rows=None):
+    """
+    纯Python引擎处理文件：file_engine 为自动识别出的文件类型（见 PYTHON_ENGINE_READERS）
+    数据行数超过 max_rows 时返回None，由调用方改用pandas引擎
+    """
+    rows = PYTHON_ENGINE_READERS[file_engine](rewind(source), max_rows)
+    if rows is None:
+        return None
+    result_df = summarize_totals(aggregate_spec_rows_python(rows), size_order=size_order)
+    record_processed_rows(len(rows), result_df)
+    return result_df
+
+
+def process_excel_data(source, engine='auto', size_order=None):
+    """
+    直接处理Excel文件，按照指定尺寸顺序排序，并去除时间标记
+    source 可以是文件路径，也可以是上传内容的二进制文件对象（不需要先写到磁盘）
+    engine 指定读取引擎（见 READER_ENGINES，python 为纯Python引擎），默认根据文件自动选择，
+    小文件（不超过 PYTHON_ENGINE_ROWS 行）自动使用纯Python引擎
+    size_order 指定尺寸顺序方案（见 SIZE_ORDER_PROFILES），默认按规格编码前缀选择
+    """
+    if size_order and size_order not in SIZE_RANKS:
+        raise ValueError(f'未知的尺寸顺序方案: {size_order}')
+
+    auto = engine == 'auto'
+    if auto or engine == 'python':
+        file_engine = detect_reader_engine(source)
+        if engine == 'python' and file_engine not in PYTHON_ENGINE_READERS:
+            raise ValueError('纯Python引擎只支持xlsx、CSV和TSV文件')
+        engine = file_engine if auto else engine
+    if engine != 'python' and engine not in READER_ENGINES:
+        raise ValueError(f'不支持的读取引擎: {engine}')
+
+    # 在后台任务中处理时，按已读取的字节数报告读取进度
+    report_progress('read')
+    if current_job() is not None and hasattr(source, 'read'):
+        source = ProgressReader(source)
+
+    if engine == 'python':
+        return process_with_python(source, file_engine, size_order=size_order)
+    if auto and PYTHON_ENGINE_ROWS and engine in PYTHON_ENGINE_READERS:
+        result_df = process_with_python(source, engine, size_order=size_order, max_rows=PYTHON_ENGINE_ROWS)
+        if result_df is not None:
+            return result_df
+
+    grouped = READER_ENGINES[engine](rewind(source))
+
+    report_progress('render')
+    result_df = summarize_groups(grouped, size_order=size_order)
+    record_processed_rows(grouped.attrs.get('source_rows'), result_df)
+    return result_df
+
+
+# 批量处理：多个文件的读取和解析在进程池中并行执行（绕开GIL），各文件的部分汇总再合并为一份结果
+# BATCH_WORKERS 为进程数，设为1或在Vercel上时在当前进程中依次处理
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', os.cpu_count() or 1))
+MAX_BATCH_FILES = int(os.environ.get('MAX_BATCH_FILES', 50))
+batch_executor = None
+batch_executor_lock = threading.Lock()
+
+
+def get_batch_executor():
+    """第一次批量处理时创建进程池；子进程用spawn方式启动，不继承父进程中其他线程持有的锁"""
+    global batch_executor
+    with batch_executor_lock:
+        if batch_executor is None:
+            batch_executor = ProcessPoolExecutor(
+                max_workers=BATCH_WORKERS, mp_context=multiprocessing.get_context('spawn')
+            )
+        return batch_executor
+
+
+def reset_batch_executor():
+    global batch_executor
+    with batch_executor_lock:
+        batch_executor = None
+
+
+def read_batch_file(filename, data, engine='auto'):
+    """
+    读取并解析一个文件，返回 (规格编码, 颜色, 标准化尺寸) 的部分汇总和统计信息
+    在进程池的子进程中执行，文件内容以字节传入
+    """
+    started = time.perf_counter()
+    source = BytesIO(data)
+    auto = engine == 'auto'
+    if auto or engine == 'python':
+        file_engine = detect_reader_engine(source)
+        if engine == 'python' and file_engine not in PYTHON_ENGINE_READERS:
+            raise ValueError('纯Python引擎只支持xlsx、CSV和TSV文件')
+        engine = file_engine if auto else engine
+    if engine != 'python' and engine not in READER_ENGINES:
+        raise ValueError(f'不支持的读取引擎: {engine}')
+
+    # 与 process_excel_data 相同：自动选择时，不超过 PYTHON_ENGINE_ROWS 行的文件使用纯Python引擎
+    rows = None
+    if engine == 'python':
+        rows = PYTHON_ENGINE_READERS[file_engine](rewind(source))
+    elif auto and PYTHON_ENGINE_ROWS and engine in PYTHON_ENGINE_READERS:
+        rows = PYTHON_ENGINE_READERS[engine](rewind(source), PYTHON_ENGINE_ROWS)
+        if rows is not None:
+            engine = 'python'
+    if rows is not None:
+        grouped = totals_frame(aggregate_spec_rows_python(rows), len(rows))
+    else:
+        grouped = READER_ENGINES[engine](rewind(source))
+    return grouped, {
+        'filename': filename,
+        'engine': engine,
+        'rows': grouped.attrs.get('source_rows'),
+        'groups': len(grouped),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+def canonical_code(code):
+    """
+    整数值的浮点数规格编码转换为整数：有空单元格的数字编码列会被 pandas 读成浮点数，
+    这个文件中的 1001.0 与其他文件中的 1001 是同一个编码
+    """
+    if isinstance(code, float) and code.is_integer():
+        return int(code)
+    return code
+
+
+def canonical_codes(codes):
+    """
+    统一多个文件合并后的规格编码：整数值的浮点数转换为整数；
+    不同文件的规格编码类型可能不同（Excel中的数字、CSV中的文本），数字和文本混在一起时统一按文本处理
+    """
+    codes = codes.astype(object).map(canonical_code)
+    if pd.api.types.infer_dtype(codes, skipna=True).startswith('mixed'):
+        codes = codes.astype(str)
+    return codes
+
+
+def merge_partial_groups(partials):
+    """合并各文件的部分汇总，同一个编码在各文件中类型不同时先统一，结果与把所有文件的行放在一起汇总相同"""
+    combined = pd.concat(
+        [grouped.astype({column: object for column in GROUP_KEYS}) for grouped in partials],
+        ignore_index=True
+    )
+    combined['规格编码'] = canonical_codes(combined['规格编码'])
+    combined = combined.astype({column: 'category' for column in GROUP_KEYS})
+    return combined.groupby(GROUP_KEYS, observed=True)['规格数量'].sum().reset_index()
+
+
+def process_excel_batch(files, engine='auto', size_order=None):
+    """
+    批量处理多个文件并合并为一份汇总结果，files 为 [(文件名, 文件内容字节)]
+    返回 (汇总结果, 每个文件的统计信息列表)；任何一个文件出错时整批失败并指出出错的文件
+    """
+    if size_order and size_order not in SIZE_RANKS:
+        raise ValueError(f'未知的尺寸顺序方案: {size_order}')
+
+    report_progress('read')
+    if BATCH_WORKERS > 1 and len(files) > 1 and not os.environ.get('VERCEL'):
+        executor = get_batch_executor()
+        futures = [executor.submit(read_batch_file, filename, data, engine) for filename, data in files]
+    else:
+        futures = None
+
+    partials = []
+    file_stats = []
+    for index, (filename, data) in enumerate(files):
+        try:
+            grouped, stats = futures[index].result() if futures else read_batch_file(filename, data, engine)
+        except BrokenProcessPool as e:
+            # 子进程异常退出后进程池不能再用，下次批量处理时重新创建
+            reset_batch_executor()
+            raise ValueError(f'文件 {filename} 处理出错: {str(e)}') from e
+        except Exception as e:
+            raise ValueError(f'文件 {filename} 处理出错: {str(e)}') from e
+        partials.append(grouped)
+        file_stats.append(stats)
+        report_progress('read', (index + 1) / len(files))
+
+    report_progress('aggregate')
+    grouped = merge_partial_groups(partials)
+
+    report_progress('render')
+    result_df = summarize_groups(grouped, size_order=size_order)
+    record_processed_rows(sum(stats['rows'] or 0 for stats in file_stats), result_df)
+    return result_df, file_stats
+
+
+# 尺寸顺序方案：方案名称 -> 尺寸顺序
+# 可以通过 SIZE_ORDER_FILE 指定JSON文件（{"profiles": {...}, "prefixes": {...}}）覆盖
+DEFAULT_SIZE_ORDER_PROFILES = {
+    'default': ['S', 'M', 'L', 'XL', '2XL', '3XL', '4XL', '5XL', '6XL'],
+    # 计数5.py 中使用的顺序
+    'legacy': ['L', 'M', 'S', 'XL', '2XL'],
+    # 童装身高尺码
+    'kids': ['59', '66', '73', '80', '90', '100', '110', '120', '130', '140', '150', '160', '170'],
+    # 鞋码
+    'shoes': [str(size) for size in range(33, 47)],
+}
+
+# 规格编码前缀 -> 尺寸顺序方案，没有匹配的前缀时使用default
+DEFAULT_SIZE_ORDER_PREFIXES = {}
+
+
+def load_size_order_config():
+    """读取尺寸顺序方案和规格编码前缀配置，设置了 SIZE_ORDER_FILE 时从该JSON文件读取"""
+    profiles = dict(DEFAULT_SIZE_ORDER_PROFILES)
+    prefixes = dict(DEFAULT_SIZE_ORDER_PREFIXES)
+    config_file = os.environ.get('SIZE_ORDER_FILE')
+    if config_file:
+        with open(config_file, encoding='utf-8') as f:
+            config = json.load(f)
+        profiles.update(config.get('profiles', {}))
+        prefixes.update(config.get('prefixes', {}))
+    return profiles, prefixes
+
+
+SIZE_ORDER_PROFILES, SIZE_ORDER_PREFIXES = load_size_order_config()
+
+# 每个方案编译为 尺寸 -> 排序位置 的字典，启动时计算一次，排序时直接查字典
+SIZE_RANKS = {
+    name: {size: index for index, size in enumerate(order)}
+    for name, order in SIZE_ORDER_PROFILES.items()
+}
+
+# 尺寸开头的数字部分，用于不在顺序中的尺寸按数值排序（如 90 < 100 < 110）
+SIZE_NUMBER_PATTERN = re.compile(r'^(\d+(?:\.\d+)?)')
+
+
+def fallback_size_key(size):
+    """不在顺序中的尺寸的排序键：以数字开头的按数值排在前面，其余按文本排序"""
+    number_match = SIZE_NUMBER_PATTERN.match(size)
+    if number_match:
+        return 0, float(number_match.group(1)), size
+    return 1, 0.0, size
+
+
+def size_order_for_code(code):
+    """按规格编码前缀选择尺寸顺序方案，多个前缀匹配时取最长的"""
+    code = str(code)
+    matched = [prefix for prefix in SIZE_ORDER_PREFIXES if code.startswith(prefix)]
+    if matched:
+        return SIZE_ORDER_PREFIXES[max(matched, key=len)]
+    return 'default'
+
+
+def rank_sizes(profile, sizes):
+    """
+    计算一组不同尺寸在指定方案下的排序位置：
+    方案中的尺寸按方案顺序，不在方案中的放在最后并按 fallback_size_key 确定顺序
+    """
+    if profile not in SIZE_RANKS:
+        raise ValueError(f'未知的尺寸顺序方案: {profile}')
+    size_rank = SIZE_RANKS[profile]
+    ranks = {size: size_rank[size] for size in sizes if size in size_rank}
+    unknown = sorted((size for size in sizes if size not in size_rank), key=fallback_size_key)
+    for offset, size in enumerate(unknown):
+        ranks[size] = len(size_rank) + offset
+    return ranks
+
+
+def summarize_groups(grouped, size_order=None):
+    """
+    把 (规格编码, 颜色, 标准化尺寸, 规格数量) 的分组结果合并为每个规格编码和颜色一行的汇总结果
+    尺寸和数量全程保持原始类型，每组只拼接一次 "尺寸*数量，尺寸*数量" 字符串
+    size_order 指定尺寸顺序方案，不指定时按规格编码前缀选择
+    """
+    sizes = grouped['标准化尺寸'].astype(str).str.strip()
+
+    # 每个规格编码对应的方案，以及每个方案下出现过的尺寸的排序位置
+    codes = grouped['规格编码']
+    code_profiles = {code: size_order or size_order_for_code(code) for code in codes.unique()}
+    profiles = codes.map(code_profiles)
+    profile_sizes = {}
+    for profile, size in zip(profiles, sizes):
+        profile_sizes.setdefault(profile, set()).add(size)
+    rank_tables = {profile: rank_sizes(profile, profile_sizes[profile]) for profile in profile_sizes}
+
+    items = pd.DataFrame({
+        '规格编码': grouped['规格编码'],
+        '颜色': grouped['颜色'],
+        # 按照尺寸顺序方案中的位置排序，不在顺序中的放在最后
+        '排序': [rank_tables[profile][size] for profile, size in zip(profiles, sizes)],
+        # 格式：尺寸*数量（相同尺寸已在分组时合并）
+        '尺寸数量': sizes + '*' + grouped['规格数量'].astype('int64').astype(str),
+    })
+
+    # 每行所属的 (规格编码, 颜色) 组号（按键排序），先按组号、再按尺寸位置稳定排序，
+    # 同一位置的尺寸保持分组时的顺序
+    group_ids = items.groupby(['规格编码', '颜色'], observed=True).ngroup().to_numpy()
+    order = np.lexsort((items['排序'].to_numpy(), group_ids))
+    group_ids = group_ids[order]
+    size_quantities = items['尺寸数量'].to_numpy()[order]
+
+    # 每组第一行的位置，按位置切分后每组拼接一次，使用中文逗号连接
+    starts = np.flatnonzero(np.diff(group_ids, prepend=-1))
+    ends = np.append(starts[1:], len(group_ids))
+    result_df = items[['规格编码', '颜色']].iloc[order[starts]].reset_index(drop=True)
+    result_df['尺寸数量'] = ['，'.join(size_quantities[start:end]) for start, end in zip(starts, ends)]
+
+    # 规格编码和颜色保持category类型，只有最终的结果字符串需要逐行生成
+    for column in ['规格编码', '颜色']:
+        result_df[column] = result_df[column].astype('category').cat.remove_unused_categories()
+    result_df['结果'] = (
+        result_df['规格编码'].astype(str) + '-' + result_df['颜色'].astype(str) + '-' + result_df['尺寸数量']
+    )
 
     return result_df
 
 
+def parser_config_version():
+    """当前解析配置（时间标记规则、尺寸顺序方案）的版本号，配置变化后缓存的结果不再命中"""
+    config = [SHIPPING_TAG_RULES, SIZE_ORDER_PROFILES, SIZE_ORDER_PREFIXES]
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+# 按上传内容缓存处理结果：上传内容哈希 -> (result_id, 响应内容)
+# 同一份备货单重复上传（刷新页面、换个文件名导出）时直接返回缓存的结果
+RESULT_CACHE_BYTES = int(os.environ.get('RESULT_CACHE_BYTES', 64 * 1024 * 1024))
+result_cache = OrderedDict()
+result_cache_stats = Counter(hits=0, misses=0, evictions=0, bytes=0)
+result_cache_lock = threading.Lock()
+
+
+def upload_cache_key(stream, *options):
+    """计算上传内容的哈希，加上解析配置版本和处理参数作为缓存键"""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(1024 * 1024), b''):
+        digest.update(chunk)
+    rewind(stream)
+    digest.update(json.dumps([parser_config_version(), *options]).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def result_cache_get(key):
+    """查找缓存的处理结果，对应的结果已不在存储中时视为未命中"""
+    with result_cache_lock:
+        entry = result_cache.get(key)
+        if entry is not None and entry[0] not in result_store:
+            del result_cache[key]
+            result_cache_stats['bytes'] -= len(entry[1])
+            entry = None
+        if entry is None:
+            result_cache_stats['misses'] += 1
+            return None
+        result_cache.move_to_end(key)
+        result_cache_stats['hits'] += 1
+        return entry
+
+
+def result_cache_put(key, result_id, body):
+    """缓存处理结果，总大小超过 RESULT_CACHE_BYTES 时移除最久未使用的项目"""
+    if len(body) > RESULT_CACHE_BYTES:
+        return
+    with result_cache_lock:
+        old = result_cache.pop(key, None)
+        if old is not None:
+            result_cache_stats['bytes'] -= len(old[1])
+        result_cache[key] = (result_id, body)
+        result_cache_stats['bytes'] += len(body)
+        while result_cache_stats['bytes'] > RESULT_CACHE_BYTES:
+            _, (_, evicted_body) = result_cache.popitem(last=False)
+            result_cache_stats['bytes'] -= len(evicted_body)
+            result_cache_stats['evictions'] += 1
+
+
 def auto_adjust_column_width(file_path):
     """
     自动调整Excel列宽
     """
     # 加载工作簿
-    workbook = load_workbook(file_path)
+    workbook = openpyxl.load_workbook(file_path)
     worksheet = workbook.active
 
     # 遍历所有列，自动调整列宽
     for column in worksheet.columns:
         max_length = 0
-        column_letter = get_column_letter(column[0].column)
+        column_letter = openpyxl.utils.get_column_letter(column[0].column)
 
         # 计算每列的最大宽度
         for cell in column:
@@ -178,12 +1043,97 @@ def auto_adjust_column_width(file_path):
     workbook.save(file_path)
 
 
+# 前端依赖：默认从CDN加载；运行 python build_files.py --vendor 下载到 VENDOR_DIR 后改为由本站 /vendor 提供，
+# 仓库网络慢或连不上外网时页面也能正常显示。名称 -> (VENDOR_DIR 下的路径, CDN地址)，路径带版本号，内容不会变化
+VENDOR_DIR = os.environ.get('VENDOR_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'vendor'))
+VENDOR_MAX_AGE = int(os.environ.get('VENDOR_MAX_AGE', 365 * 24 * 3600))
+VENDOR_ASSETS = {
+    'bootstrap_css': ('bootstrap/5.3.0/css/bootstrap.min.css',
+                      'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css'),
+    'bootstrap_js': ('bootstrap/5.3.0/js/bootstrap.bundle.min.js',
+                     'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js'),
+    'font_awesome_css': ('font-awesome/6.4.0/css/all.min.css',
+                         'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css'),
+    # 页面只用到实心图标（fas），预加载这一个字体文件
+    'font_awesome_font': ('font-awesome/6.4.0/webfonts/fa-solid-900.woff2',
+                          'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/webfonts/fa-solid-900.woff2'),
+}
+
+# 首页浏览器缓存时间（秒），过期后带 If-None-Match 重新验证，页面没有变化时返回304
+INDEX_MAX_AGE = int(os.environ.get('INDEX_MAX_AGE', 300))
+
+
+def vendor_asset_url(name):
+    """前端依赖的地址：已经下载到 VENDOR_DIR 时用本站地址，否则用CDN地址"""
+    path, cdn_url = VENDOR_ASSETS[name]
+    if os.path.isfile(os.path.join(VENDOR_DIR, path)):
+        return f'/vendor/{path}'
+    return cdn_url
+
+
+def asset_hints(urls):
+    """
+    预连接CDN，并预加载脚本和字体（字体要等CSS解析完才会开始下载，预加载可以和CSS并行）
+    CSS和脚本不带 crossorigin 请求，字体带 crossorigin 请求，浏览器为两者分别建立连接
+    """
+    font_url = urls['font_awesome_font']
+    hints = [f'<link rel="preconnect" href="https://{origin}">'
+             for origin in sorted({url.split('/')[2] for url in urls.values() if url.startswith('https://')})]
+    if font_url.startswith('https://'):
+        hints.append(f'<link rel="preconnect" href="https://{font_url.split("/")[2]}" crossorigin>')
+    hints.append(f'<link rel="preload" href="{font_url}" as="font" type="font/woff2" crossorigin>')
+    hints.append(f'<link rel="preload" href="{urls["bootstrap_js"]}" as="script">')
+    return '\n        '.join(hints)
+
+
+@app.route('/vendor/<path:path>')
+def vendor_asset(path):
+    """本站提供的前端依赖，路径带版本号，浏览器可以长期缓存"""
+    return send_from_directory(VENDOR_DIR, path, max_age=VENDOR_MAX_AGE)
+
+
+# 预先生成的首页：{'identity': 页面内容, 'gzip'/'br': 压缩后的内容, 'etag': 内容哈希}
+index_page = None
+index_page_lock = threading.Lock()
+
+
+def get_index_page():
+    """
+    首页只生成一次：页面内容只取决于配置，运行期间不变；默认文件名中的日期由浏览器计算
+    同时预先压缩好各种编码，请求时直接发送，不再逐次拼接和压缩
+    """
+    global index_page
+    with index_page_lock:
+        if index_page is None:
+            data = render_index_page().encode('utf-8')
+            page = {'identity': data, 'etag': hashlib.sha256(data).hexdigest()[:32]}
+            for encoding in (['br', 'gzip'] if brotli_available() else ['gzip']):
+                page[encoding] = b''.join(compress_chunks([data], encoding))
+            index_page = page
+        return index_page
+
+
 @app.route('/')
 def index():
-    """主页面"""
-    # 获取当前日期用于默认文件名
-    current_date = datetime.now().strftime('%Y-%m-%d')
-    default_filename = f'备货单汇总{current_date}'
+    """主页面：按 Accept-Encoding 发送预先压缩好的页面，每种编码各有一个强 ETag"""
+    page = get_index_page()
+    encoding = negotiate_encoding(request.accept_encodings)
+    response = send_file(
+        BytesIO(page[encoding] if encoding else page['identity']),
+        mimetype='text/html',
+        etag=f"{page['etag']}-{encoding}" if encoding else page['etag'],
+        conditional=True,
+        max_age=INDEX_MAX_AGE
+    )
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def render_index_page():
+    """生成首页HTML"""
+    urls = {name: vendor_asset_url(name) for name in VENDOR_ASSETS}
 
     return f'''
     <!DOCTYPE html>
@@ -192,8 +1142,9 @@ def index():
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
         <title>Excel数据处理与展示</title>
-        <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
-        <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css">
+        {asset_hints(urls)}
+        <link href="{urls['bootstrap_css']}" rel="stylesheet">
+        <link rel="stylesheet" href="{urls['font_awesome_css']}">
         <style>
             body {{
                 background-color: #f8f9fa;
@@ -246,6 +1197,30 @@ def index():
                 border: 1px solid #dee2e6;
                 border-radius: 8px;
             }}
+            .virtual-table {{
+                table-layout: fixed;
+                margin-bottom: 0;
+            }}
+            .virtual-table th[data-sort] {{
+                cursor: pointer;
+                user-select: none;
+            }}
+            .virtual-table td {{
+                height: {RESULT_ROW_HEIGHT}px;
+                padding: 4px 8px;
+                line-height: 24px;
+                white-space: nowrap;
+                overflow: hidden;
+                text-overflow: ellipsis;
+            }}
+            .virtual-table tr.stripe td {{
+                background-color: rgba(0, 0, 0, 0.05);
+            }}
+            .virtual-table tr.spacer td {{
+                height: auto;
+                padding: 0;
+                border: none;
+            }}
             .btn-primary {{
                 background: linear-gradient(135deg, #0066cc 0%, #0099ff 100%);
                 border: none;
@@ -344,15 +1319,15 @@ def index():
                             <div class="upload-area" id="uploadArea">
                                 <i class="fas fa-cloud-upload-alt fa-3x text-muted mb-3"></i>
                                 <h5>拖放文件到此处或点击上传</h5>
-                                <p class="text-muted">支持 .xlsx 格式的Excel文件</p>
+                                <p class="text-muted">支持 .xlsx 格式的Excel文件，以及ERP导出的 .csv / .tsv 文件；可以同时选择多个文件合并汇总</p>
                                 <button class="btn btn-primary mt-2">选择文件</button>
-                                <input type="file" id="fileInput" class="file-input" accept=".xlsx">
+                                <input type="file" id="fileInput" class="file-input" accept=".xlsx,.xls,.csv,.tsv,.txt" multiple>
                             </div>
                             <div class="loading mt-3 text-center" id="loading">
                                 <div class="spinner-border text-primary" role="status">
                                     <span class="visually-hidden">处理中...</span>
                                 </div>
-                                <p class="mt-2">正在处理文件，请稍候...</p>
+                                <p class="mt-2" id="loadingText">正在处理文件，请稍候...</p>
                             </div>
                         </div>
                     </div>
@@ -365,6 +1340,23 @@ def index():
                     <div class="card">
                         <div class="card-body">
                             <h5 class="card-title"><i class="fas fa-table me-2"></i>处理结果</h5>
+                            <p class="text-muted small mb-2" id="batchInfo"></p>
+                            <div class="row g-2 mb-3 align-items-center" id="searchArea" style="display: none;">
+                                <div class="col-md-3">
+                                    <input type="text" id="searchCode" class="form-control" placeholder="规格编码（前缀）">
+                                </div>
+                                <div class="col-md-3">
+                                    <input type="text" id="searchColor" class="form-control" placeholder="颜色">
+                                </div>
+                                <div class="col-md-2">
+                                    <input type="text" id="searchSize" class="form-control" placeholder="尺寸">
+                                </div>
+                                <div class="col-md-4">
+                                    <button class="btn btn-primary" id="searchBtn"><i class="fas fa-search me-1"></i>查找</button>
+                                    <button class="btn btn-outline-secondary ms-1" id="clearSearchBtn">清除</button>
+                                    <span class="text-muted ms-2" id="searchInfo"></span>
+                                </div>
+                            </div>
                             <div id="resultArea" class="table-container">
                                 <p class="text-center text-muted p-4">上传Excel文件后，处理结果将在此显示</p>
                             </div>
@@ -373,7 +1365,7 @@ def index():
                                     <div class="row align-items-center">
                                         <div class="col-md-6">
                                             <label for="fileName" class="form-label">文件名：</label>
-                                            <input type="text" id="fileName" class="form-control" value="{default_filename}" placeholder="请输入文件名">
+                                            <input type="text" id="fileName" class="form-control" value="" placeholder="请输入文件名">
                                         </div>
                                         <div class="col-md-6 text-end">
                                             <button class="btn btn-success" id="downloadBtn">
@@ -399,20 +1391,49 @@ def index():
             </div>
         </footer>
 
-        <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js"></script>
+        <script src="{urls['bootstrap_js']}"></script>
         <script>
             // 全局变量存储处理结果的ID
             let currentResultId = null;
 
+            // 结果表格虚拟滚动：只渲染可见区域的行，其余行按页从 /results/<result_id> 读取
+            const PAGE_SIZE = {RESULT_PAGE_SIZE};
+            const ROW_HEIGHT = {RESULT_ROW_HEIGHT};
+            const OVERSCAN_ROWS = 20;  // 可见区域上下额外渲染的行数
+            const MAX_CACHED_PAGES = 50;
+
+            // 超过这个大小的文件使用后台任务处理，页面轮询显示进度
+            const ASYNC_UPLOAD_BYTES = {ASYNC_UPLOAD_BYTES};
+            const JOB_POLL_INTERVAL = 500;
+            const STAGE_NAMES = {{queued: '排队中', read: '正在读取文件', parse: '正在解析规格', aggregate: '正在汇总', render: '正在生成结果'}};
+            let resultView = null;  // {{id, total, sort, query: 查找条件, pages: 页号 -> 行, pending: 正在读取的页号}}
+
             document.addEventListener('DOMContentLoaded', function() {{
                 const uploadArea = document.getElementById('uploadArea');
                 const fileInput = document.getElementById('fileInput');
                 const resultArea = document.getElementById('resultArea');
                 const loading = document.getElementById('loading');
+                const loadingText = document.getElementById('loadingText');
                 const downloadArea = document.getElementById('downloadArea');
                 const downloadBtn = document.getElementById('downloadBtn');
                 const downloadCsvBtn = document.getElementById('downloadCsvBtn');
                 const fileNameInput = document.getElementById('fileName');
+                const searchArea = document.getElementById('searchArea');
+                const searchInputs = {{
+                    code: document.getElementById('searchCode'),
+                    color: document.getElementById('searchColor'),
+                    size: document.getElementById('searchSize')
+                }};
+                const searchInfo = document.getElementById('searchInfo');
+                const batchInfo = document.getElementById('batchInfo');
+
+                // 默认文件名：备货单汇总 + 今天的日期（按浏览器本地日期计算，页面本身不随日期变化，可以缓存）
+                const today = new Date();
+                fileNameInput.value = '备货单汇总' + [
+                    today.getFullYear(),
+                    String(today.getMonth() + 1).padStart(2, '0'),
+                    String(today.getDate()).padStart(2, '0')
+                ].join('-');
 
                 // 点击上传区域触发文件选择
                 uploadArea.addEventListener('click', function() {{
@@ -422,7 +1443,7 @@ def index():
                 // 文件选择变化
                 fileInput.addEventListener('change', function(e) {{
                     if (e.target.files.length > 0) {{
-                        processExcelFile(e.target.files[0]);
+                        processExcelFiles(Array.from(e.target.files));
                     }}
                 }});
 
@@ -440,85 +1461,289 @@ def index():
                     e.preventDefault();
                     uploadArea.classList.remove('dragover');
                     if (e.dataTransfer.files.length > 0) {{
-                        processExcelFile(e.dataTransfer.files[0]);
+                        processExcelFiles(Array.from(e.dataTransfer.files));
                     }}
                 }});
 
-                // 处理Excel文件
-                function processExcelFile(file) {{
-                    if (!file.name.endsWith('.xlsx')) {{
-                        alert('请上传.xlsx格式的Excel文件');
+                // 处理Excel文件，多个文件合并为一份汇总
+                function processExcelFiles(files) {{
+                    if (!files.every(file => /\\.(xlsx|xls|csv|tsv|txt)$/i.test(file.name))) {{
+                        alert('请上传.xlsx格式的Excel文件或CSV/TSV文件');
                         return;
                     }}
 
                     loading.style.display = 'block';
+                    loadingText.textContent = '正在处理文件，请稍候...';
                     resultArea.innerHTML = '<p class="text-center text-muted p-4">正在处理文件，请稍候...</p>';
                     downloadArea.style.display = 'none';
 
                     const formData = new FormData();
-                    formData.append('file', file);
+                    files.forEach(file => formData.append('file', file));
+                    const totalSize = files.reduce((size, file) => size + file.size, 0);
 
-                    fetch('/process', {{
+                    fetch(totalSize >= ASYNC_UPLOAD_BYTES ? '/process?async=1' : '/process', {{
                         method: 'POST',
                         body: formData
                     }})
                     .then(response => response.json())
                     .then(data => {{
-                        if (data.success) {{
-                            currentResultId = data.result_id; // 保存结果ID
-                            displayResults(data.results);
+                        if (data.job_id && (data.status === 'queued' || data.status === 'running')) {{
+                            pollJob(data.job_id);
                         }} else {{
-                            resultArea.innerHTML = '<p class="text-center text-danger p-4">' + data.error + '</p>';
+                            showProcessResult(data);
                         }}
-                        loading.style.display = 'none';
                     }})
-                    .catch(error => {{
-                        console.error('处理文件时出错:', error);
-                        loading.style.display = 'none';
-                        resultArea.innerHTML = '<p class="text-center text-danger p-4">处理文件时出错，请检查文件格式是否正确</p>';
-                    }});
+                    .catch(showProcessError);
+                }}
+
+                // 轮询后台任务，显示当前阶段和进度，完成后显示结果
+                function pollJob(jobId) {{
+                    fetch('/jobs/' + encodeURIComponent(jobId))
+                    .then(response => response.json())
+                    .then(data => {{
+                        if (data.status === 'queued' || data.status === 'running') {{
+                            loadingText.textContent = (STAGE_NAMES[data.stage] || '正在处理文件') + '... ' + data.progress + '%';
+                            setTimeout(() => pollJob(jobId), JOB_POLL_INTERVAL);
+                        }} else {{
+                            showProcessResult(data);
+                        }}
+                    }})
+                    .catch(showProcessError);
+                }}
+
+                function showProcessResult(data) {{
+                    if (data.success) {{
+                        currentResultId = data.result_id; // 保存结果ID
+                        displayResults(data);
+                    }} else {{
+                        resultArea.innerHTML = '<p class="text-center text-danger p-4">' + escapeHtml(data.error) + '</p>';
+                    }}
+                    loading.style.display = 'none';
+                }}
+
+                function showProcessError(error) {{
+                    console.error('处理文件时出错:', error);
+                    loading.style.display = 'none';
+                    resultArea.innerHTML = '<p class="text-center text-danger p-4">处理文件时出错，请检查文件格式是否正确</p>';
                 }}
 
-                // 显示处理结果
-                function displayResults(results) {{
-                    if (results.length === 0) {{
+                // 显示处理结果：data 中只有第一页，其余页滚动到时再读取
+                function displayResults(data) {{
+                    // 多个文件合并汇总时显示每个文件的行数和耗时
+                    batchInfo.textContent = data.files ? `已合并 ${{data.files.length}} 个文件：` + data.files.map(
+                        file => `${{file.filename}} ${{file.rows}} 行（${{file.seconds}} 秒）`
+                    ).join('，') : '';
+
+                    if (data.total === 0) {{
+                        resultView = null;
+                        searchArea.style.display = 'none';
                         resultArea.innerHTML = '<p class="text-center text-muted p-4">未找到可处理的数据</p>';
                         return;
                     }}
 
-                    let tableHTML = `
-                        <table class="table table-striped result-table">
+                    resultView = {{
+                        id: data.result_id,
+                        total: data.total,
+                        sort: '',
+                        query: '',
+                        pages: new Map([[0, data.results]]),
+                        pending: new Set()
+                    }};
+                    Object.values(searchInputs).forEach(input => input.value = '');
+                    searchInfo.textContent = '';
+                    searchArea.style.display = 'flex';
+
+                    resultArea.innerHTML = `
+                        <table class="table result-table virtual-table">
+                            <colgroup>
+                                <col style="width: 80px">
+                                <col style="width: 140px">
+                                <col style="width: 160px">
+                                <col>
+                            </colgroup>
                             <thead>
                                 <tr>
                                     <th>序号</th>
-                                    <th>规格编码</th>
-                                    <th>颜色</th>
-                                    <th>汇总结果</th>
+                                    <th data-sort="规格编码">规格编码</th>
+                                    <th data-sort="颜色">颜色</th>
+                                    <th data-sort="结果">汇总结果</th>
                                 </tr>
                             </thead>
-                            <tbody>
+                            <tbody></tbody>
+                        </table>
                     `;
+                    resultArea.querySelectorAll('th[data-sort]').forEach(th => {{
+                        th.addEventListener('click', () => sortResults(th.dataset.sort));
+                    }});
+                    resultArea.scrollTop = 0;
+                    renderVisibleRows();
+                    downloadArea.style.display = 'block';
+                }}
 
-                    results.forEach((item, index) => {{
-                        tableHTML += `
-                            <tr>
-                                <td>${{index + 1}}</td>
-                                <td>${{item.规格编码}}</td>
-                                <td>${{item.颜色}}</td>
-                                <td>${{item.结果}}</td>
-                            </tr>
-                        `;
+                // 点击表头排序：同一列再次点击切换升序/降序
+                function sortResults(column) {{
+                    const view = resultView;
+                    resultView = {{
+                        id: view.id,
+                        total: view.total,
+                        sort: view.sort === column ? '-' + column : column,
+                        query: view.query,
+                        pages: new Map(),
+                        pending: new Set()
+                    }};
+                    resultArea.querySelectorAll('th[data-sort]').forEach(th => {{
+                        const sort = resultView.sort.replace(/^-/, '');
+                        const arrow = th.dataset.sort !== sort ? '' : (resultView.sort.startsWith('-') ? ' ▼' : ' ▲');
+                        th.textContent = (th.dataset.sort === '结果' ? '汇总结果' : th.dataset.sort) + arrow;
                     }});
+                    resultArea.scrollTop = 0;
+                    renderVisibleRows();
+                }}
 
-                    tableHTML += `
-                            </tbody>
-                        </table>
-                    `;
+                // 按规格编码前缀、颜色、尺寸在服务器端查找，表格只显示匹配的行
+                function searchResults() {{
+                    const view = resultView;
+                    if (!view) {{
+                        return;
+                    }}
 
-                    resultArea.innerHTML = tableHTML;
-                    downloadArea.style.display = 'block';
+                    const params = new URLSearchParams();
+                    Object.entries(searchInputs).forEach(([name, input]) => {{
+                        if (input.value.trim()) {{
+                            params.set(name, input.value.trim());
+                        }}
+                    }});
+                    const query = params.toString();
+
+                    fetch('/results/' + encodeURIComponent(view.id) + '/search?' + query +
+                          '&limit=' + PAGE_SIZE + '&sort=' + encodeURIComponent(view.sort))
+                    .then(response => response.json())
+                    .then(data => {{
+                        if (!data.success) {{
+                            searchInfo.textContent = data.error;
+                            return;
+                        }}
+                        resultView = {{
+                            id: view.id,
+                            total: data.total,
+                            sort: view.sort,
+                            query: query,
+                            pages: new Map([[0, data.results]]),
+                            pending: new Set()
+                        }};
+                        searchInfo.textContent = query ? `找到 ${{data.total}} 条` : '';
+                        resultArea.scrollTop = 0;
+                        renderVisibleRows();
+                    }})
+                    .catch(error => {{
+                        console.error('查找时出错:', error);
+                    }});
+                }}
+
+                document.getElementById('searchBtn').addEventListener('click', searchResults);
+                document.getElementById('clearSearchBtn').addEventListener('click', function() {{
+                    Object.values(searchInputs).forEach(input => input.value = '');
+                    searchResults();
+                }});
+                Object.values(searchInputs).forEach(input => {{
+                    input.addEventListener('keydown', e => {{
+                        if (e.key === 'Enter') {{
+                            searchResults();
+                        }}
+                    }});
+                }});
+
+                function escapeHtml(value) {{
+                    return String(value ?? '').replace(/[&<>"']/g, c => ({{
+                        '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'
+                    }})[c]);
+                }}
+
+                // 渲染可见区域的行，上下用占位行撑开滚动高度；还没读取的页先显示“加载中”
+                function renderVisibleRows() {{
+                    const view = resultView;
+                    const tbody = resultArea.querySelector('.virtual-table tbody');
+                    if (!view || !tbody) {{
+                        return;
+                    }}
+                    if (view.total === 0) {{
+                        tbody.innerHTML = '<tr><td colspan="4" class="text-center text-muted">没有匹配的结果</td></tr>';
+                        return;
+                    }}
+
+                    const first = Math.max(0, Math.floor(resultArea.scrollTop / ROW_HEIGHT) - OVERSCAN_ROWS);
+                    const last = Math.min(view.total, Math.ceil((resultArea.scrollTop + resultArea.clientHeight) / ROW_HEIGHT) + OVERSCAN_ROWS);
+
+                    const rows = [];
+                    for (let index = first; index < last; index++) {{
+                        const page = Math.floor(index / PAGE_SIZE);
+                        if (!view.pages.has(page)) {{
+                            loadResultPage(view, page);
+                        }}
+                        const item = (view.pages.get(page) || [])[index % PAGE_SIZE];
+                        const stripe = index % 2 === 0 ? ' class="stripe"' : '';
+                        if (item) {{
+                            rows.push(`<tr${{stripe}}><td>${{index + 1}}</td><td>${{escapeHtml(item.规格编码)}}</td><td>${{escapeHtml(item.颜色)}}</td><td title="${{escapeHtml(item.结果)}}">${{escapeHtml(item.结果)}}</td></tr>`);
+                        }} else {{
+                            rows.push(`<tr${{stripe}}><td>${{index + 1}}</td><td colspan="3" class="text-muted">加载中...</td></tr>`);
+                        }}
+                    }}
+
+                    tbody.innerHTML =
+                        `<tr class="spacer"><td colspan="4" style="height: ${{first * ROW_HEIGHT}}px"></td></tr>` +
+                        rows.join('') +
+                        `<tr class="spacer"><td colspan="4" style="height: ${{(view.total - last) * ROW_HEIGHT}}px"></td></tr>`;
+                }}
+
+                // 读取一页结果，读取完成后如果还是当前表格就重新渲染
+                function loadResultPage(view, page) {{
+                    if (view.pending.has(page)) {{
+                        return;
+                    }}
+                    view.pending.add(page);
+
+                    const base = '/results/' + encodeURIComponent(view.id) + (view.query ? '/search?' + view.query + '&' : '?');
+                    const url = base + 'offset=' + page * PAGE_SIZE + '&limit=' + PAGE_SIZE + '&sort=' + encodeURIComponent(view.sort);
+                    fetch(url)
+                    .then(response => response.json())
+                    .then(data => {{
+                        view.pending.delete(page);
+                        if (!data.success) {{
+                            if (view === resultView) {{
+                                resultArea.innerHTML = '<p class="text-center text-danger p-4">' + escapeHtml(data.error) + '</p>';
+                            }}
+                            return;
+                        }}
+                        view.pages.set(page, data.results);
+                        // 只保留最近读取的若干页
+                        for (const key of view.pages.keys()) {{
+                            if (view.pages.size <= MAX_CACHED_PAGES) {{
+                                break;
+                            }}
+                            view.pages.delete(key);
+                        }}
+                        if (view === resultView) {{
+                            renderVisibleRows();
+                        }}
+                    }})
+                    .catch(error => {{
+                        view.pending.delete(page);
+                        console.error('读取处理结果时出错:', error);
+                    }});
                 }}
 
+                // 滚动时每帧最多重新渲染一次
+                let renderScheduled = false;
+                resultArea.addEventListener('scroll', function() {{
+                    if (!renderScheduled) {{
+                        renderScheduled = true;
+                        requestAnimationFrame(() => {{
+                            renderScheduled = false;
+                            renderVisibleRows();
+                        }});
+                    }}
+                }});
+
                 // 下载Excel文件
                 downloadBtn.addEventListener('click', function() {{
                     if (!currentResultId) {{
@@ -547,121 +1772,1051 @@ def index():
     '''
 
 
+
+# 按需性能分析：设置 PROFILE_TOKEN 后，带 X-Profile-Token 请求头的 /process 和下载请求加上 profile=1 时，
+# 用采样分析器记录这个请求线程的调用栈，响应头 X-Profile-Id 给出分析结果的ID，从 /profiles/<profile_id> 查看
+# 没有设置 PROFILE_TOKEN 时不能分析；不带 profile=1 的请求只多一次参数判断
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')
+PROFILE_INTERVAL_MS = int(os.environ.get('PROFILE_INTERVAL_MS', 5))  # 采样间隔（毫秒）
+PROFILE_MAX_SECONDS = int(os.environ.get('PROFILE_MAX_SECONDS', 300))  # 超过这个时间停止采样，避免响应没有关闭时一直采样
+PROFILE_CACHE_SIZE = int(os.environ.get('PROFILE_CACHE_SIZE', 20))  # 保留最近的分析结果个数
+PROFILE_TOP = 30
+profiles = OrderedDict()
+profiles_lock = threading.Lock()
+
+
+def profile_authorized():
+    """请求头中的 X-Profile-Token 与 PROFILE_TOKEN 一致"""
+    token = request.headers.get('X-Profile-Token', '')
+    return bool(PROFILE_TOKEN) and hmac.compare_digest(token.encode('utf-8'), PROFILE_TOKEN.encode('utf-8'))
+
+
+def finish_profile(profile_id, profiler, endpoint, path):
+    """停止采样，保存折叠栈和按函数汇总的表格；只保留最近 PROFILE_CACHE_SIZE 个"""
+    profiler.stop()
+    profile = {
+        'profile_id': profile_id,
+        'endpoint': endpoint,
+        'path': path,
+        'seconds': round(profiler.seconds, 3),
+        'samples': sum(profiler.samples.values()),
+        'interval_ms': PROFILE_INTERVAL_MS,
+        'top': profiler.top(PROFILE_TOP),
+        'collapsed': profiler.collapsed(),
+    }
+    with profiles_lock:
+        profiles[profile_id] = profile
+        while len(profiles) > PROFILE_CACHE_SIZE:
+            profiles.popitem(last=False)
+
+
+def profiled(view):
+    """
+    加上 profile=1 时对请求采样，从进入视图一直到响应关闭，流式响应的生成和压缩也计入
+    只采样请求线程：async=1 的后台任务只计入提交，多个文件在进程池中处理时只计入等待和合并
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.args.get('profile') != '1':
+            return view(*args, **kwargs)
+        if not profile_authorized():
+            return jsonify({'success': False, 'error': '没有权限进行性能分析'})
+
+        import uuid
+        profile_id = uuid.uuid4().hex
+        endpoint, path = request.endpoint, request.full_path
+        profiler = SamplingProfiler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000, PROFILE_MAX_SECONDS)
+        profiler.start()
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        except BaseException:
+            finish_profile(profile_id, profiler, endpoint, path)
+            raise
+        response.headers['X-Profile-Id'] = profile_id
+        # direct_passthrough 的响应体（send_file）原样交给服务器，不会调用 call_on_close 注册的函数
+        response.direct_passthrough = False
+        response.call_on_close(lambda: finish_profile(profile_id, profiler, endpoint, path))
+        return response
+
+    return wrapper
+
+
+@app.route('/profiles/<profile_id>')
+def profile_info(profile_id):
+    """
+    查看一次请求的分析结果：默认返回按函数汇总的表格（self 为函数自身在栈顶的采样次数，total 为出现在栈中的次数）；
+    format=collapsed 返回折叠栈文本，可以直接交给 flamegraph.pl 或 speedscope 生成火焰图
+    """
+    if not profile_authorized():
+        return jsonify({'success': False, 'error': '没有权限查看性能分析结果'})
+    with profiles_lock:
+        profile = profiles.get(profile_id)
+    if profile is None:
+        return jsonify({'success': False, 'error': '未找到分析结果（请求还没有结束或结果已被移除）'})
+
+    if request.args.get('format') == 'collapsed':
+        return app.response_class(profile['collapsed'], content_type='text/plain; charset=utf-8')
+    return jsonify({'success': True, **{key: value for key, value in profile.items() if key != 'collapsed'}})
+
+
 @app.route('/process', methods=['POST'])
+@profiled
 def process_excel():
-    """处理上传的Excel文件"""
+    """
+    处理上传的Excel文件；同一个请求中上传多个文件（多个 file 字段）时合并为一份汇总结果，
+    并在 files 中返回每个文件的行数和耗时
+    加上 async=1 时放入后台任务队列，立即返回任务ID，进度和结果从 /jobs/<job_id> 查询
+    """
     try:
         if 'file' not in request.files:
             return jsonify({'success': False, 'error': '没有上传文件'})
 
-        file = request.files['file']
-        if file.filename == '':
+        files = [file for file in request.files.getlist('file') if file.filename != '']
+        if not files:
             return jsonify({'success': False, 'error': '没有选择文件'})
 
-        if not file.filename.endswith('.xlsx'):
-            return jsonify({'success': False, 'error': '请上传.xlsx格式的Excel文件'})
+        if len(files) > MAX_BATCH_FILES:
+            return jsonify({'success': False, 'error': f'一次最多上传 {MAX_BATCH_FILES} 个文件'})
+
+        for file in files:
+            if not file.filename.lower().endswith(ALLOWED_EXTENSIONS):
+                return jsonify({'success': False, 'error': '请上传.xlsx格式的Excel文件或CSV/TSV文件'})
+
+        engine = request.args.get('engine', 'auto')
+        size_order = request.args.get('size_order') or None
+        run_async = request.args.get('async') == '1'
+        uploads = [(file.filename, file.stream) for file in files]
+
+        # 相同内容、相同配置的上传直接返回缓存的结果
+        cache_key = uploads_cache_key(uploads, engine, size_order)
+        cached = result_cache_get(cache_key)
+        if cached is not None:
+            if run_async:
+                return jsonify(job_info(create_job(cached[1])))
+            response = app.response_class(cached[1], mimetype=app.json.mimetype)
+            response.headers['X-Result-Cache'] = 'hit'
+            return response
+
+        if run_async:
+            # 请求结束时会关闭上传的文件，后台任务接管文件对象，不再复制一份
+            for file in files:
+                file.stream = BytesIO()
+            job = submit_job(uploads, engine, size_order, cache_key)
+            if job is None:
+                for _, stream in uploads:
+                    stream.close()
+                return jsonify({'success': False, 'error': '任务队列已满，请稍后再试'})
+            return jsonify(job_info(job))
+
+        # 直接从上传流处理Excel文件，不写命名临时文件
+        result_df, file_stats = process_uploads(uploads, engine=engine, size_order=size_order)
+        body = store_result(result_df, file_stats)
+        begin_stage('json')
+        response = jsonify(body)
+        result_cache_put(cache_key, body['result_id'], response.get_data())
+        response.headers['X-Result-Cache'] = 'miss'
+        return response
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'处理文件时出错: {str(e)}'})
+
 
-        # 保存临时文件
-        temp_dir = tempfile.gettempdir()
-        temp_path = os.path.join(temp_dir, file.filename)
-        file.save(temp_path)
+def uploads_cache_key(uploads, engine, size_order):
+    """一个或多个上传文件的缓存键，多个文件时由各文件的缓存键按上传顺序组合"""
+    keys = [upload_cache_key(stream, engine, size_order) for _, stream in uploads]
+    if len(keys) == 1:
+        return keys[0]
+    return hashlib.sha256(''.join(keys).encode('utf-8')).hexdigest()
 
-        # 处理Excel文件
-        result_df = process_excel_data(temp_path)
 
-        # 生成唯一ID用于存储处理结果
-        import uuid
-        result_id = str(uuid.uuid4())
+def process_uploads(uploads, engine='auto', size_order=None):
+    """
+    处理一个或多个上传文件，uploads 为 [(文件名, 文件对象)]
+    返回 (汇总结果, 每个文件的统计信息)；只有一个文件时直接处理，统计信息为None
+    """
+    if len(uploads) == 1:
+        return process_excel_data(uploads[0][1], engine=engine, size_order=size_order), None
+    files = [(filename, rewind(stream).read()) for filename, stream in uploads]
+    return process_excel_batch(files, engine=engine, size_order=size_order)
+
 
-        # 将处理结果存储到内存中
-        processed_data_store[result_id] = {
-            'dataframe': result_df.to_dict('records'),
-            'columns': list(result_df.columns)
+def store_result(result_df, file_stats=None):
+    """
+    保存处理结果并建立查询索引，返回 /process 的响应内容：
+    只有第一页结果和总行数，其余行由页面按需从 /results/<result_id> 分页读取
+    """
+    # 生成唯一ID用于存储处理结果
+    import uuid
+    result_id = str(uuid.uuid4())
+
+    # 将处理结果保存到结果存储中，同时建立查询索引
+    begin_stage('store')
+    result_store.put(result_id, result_df)
+    begin_stage('index')
+    store_result_index(result_id, result_df)
+
+    begin_stage('page')
+    body = {
+        'success': True,
+        'results': result_page(result_df, 0, RESULT_PAGE_SIZE),
+        'total': len(result_df),
+        'offset': 0,
+        'limit': RESULT_PAGE_SIZE,
+        'result_id': result_id
+    }
+    if file_stats is not None:
+        body['files'] = file_stats
+    return body
+
+
+# 处理阶段的耗时和内存：每个请求（或后台任务）分别记录各阶段的耗时，
+# 请求结束时写入 Server-Timing 响应头，并累计到 /metrics 的直方图中
+# STAGE_MEMORY=1 时用 tracemalloc 统计每个阶段的内存分配峰值；tracemalloc 会明显拖慢处理，
+# 而且峰值是整个进程的，同时处理多个请求时会互相计入，只在排查问题时打开
+STAGE_MEMORY = os.environ.get('STAGE_MEMORY') == '1'
+if STAGE_MEMORY:
+    tracemalloc.start()
+
+stage_seconds = Histogram('excel_stage_seconds', '各处理阶段的耗时（秒）', SECONDS_BUCKETS, ['endpoint', 'stage'])
+stage_peak_bytes = Histogram(
+    'excel_stage_peak_bytes', '各处理阶段的内存分配峰值（字节，STAGE_MEMORY=1 时统计）', BYTES_BUCKETS, ['endpoint', 'stage']
+)
+request_seconds = Histogram('excel_request_seconds', '请求的总耗时（秒）', SECONDS_BUCKETS, ['endpoint'])
+processed_rows = Histogram('excel_processed_rows', '每次处理读取的数据行数（source）和汇总结果的行数（result）',
+                           ROWS_BUCKETS, ['kind'])
+
+# 当前线程正在计时的请求或后台任务
+stage_context = threading.local()
+
+
+class StageTimer:
+    """记录一个请求（或后台任务）中各处理阶段的耗时和内存峰值，同一阶段多次进入时累加"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}  # 阶段 -> [耗时（秒）, 内存峰值（字节）]
+        self.current = None
+        self.stage_started = None
+        self.memory_base = 0
+
+    def enter(self, stage):
+        """结束上一个阶段，开始 stage 的计时；已经在这个阶段时什么也不做"""
+        if stage == self.current:
+            return
+        self.finish()
+        self.current = stage
+        self.stage_started = time.perf_counter()
+        if STAGE_MEMORY:
+            tracemalloc.reset_peak()
+            self.memory_base = tracemalloc.get_traced_memory()[0]
+
+    def finish(self):
+        """结束当前阶段的计时"""
+        if self.current is None:
+            return
+        record = self.stages.setdefault(self.current, [0.0, 0])
+        record[0] += time.perf_counter() - self.stage_started
+        if STAGE_MEMORY:
+            record[1] = max(record[1], tracemalloc.get_traced_memory()[1] - self.memory_base)
+        self.current = None
+
+    def observe(self, endpoint):
+        """结束计时，把各阶段和总耗时累计到直方图"""
+        self.finish()
+        for stage, (seconds, peak) in self.stages.items():
+            stage_seconds.observe(seconds, endpoint, stage)
+            if STAGE_MEMORY:
+                stage_peak_bytes.observe(peak, endpoint, stage)
+        request_seconds.observe(time.perf_counter() - self.started, endpoint)
+
+    def server_timing(self):
+        """Server-Timing 响应头的内容：每个阶段一项（dur 为毫秒），统计内存时 desc 为内存峰值"""
+        entries = []
+        for stage, (seconds, peak) in self.stages.items():
+            entry = f'{stage};dur={seconds * 1000:.1f}'
+            if STAGE_MEMORY:
+                entry += f';desc="peak {peak / 1024 / 1024:.1f}MB"'
+            entries.append(entry)
+        entries.append(f'total;dur={(time.perf_counter() - self.started) * 1000:.1f}')
+        return ', '.join(entries)
+
+
+def begin_stage(stage):
+    """当前请求（或后台任务）进入新的处理阶段，没有在计时时什么也不做"""
+    timer = getattr(stage_context, 'timer', None)
+    if timer is not None:
+        timer.enter(stage)
+
+
+def record_processed_rows(source_rows, result_df):
+    """累计读取的数据行数和汇总结果的行数"""
+    if source_rows is not None:
+        processed_rows.observe(source_rows, 'source')
+    processed_rows.observe(len(result_df), 'result')
+
+
+@app.before_request
+def start_stage_timer():
+    stage_context.timer = StageTimer()
+
+
+@app.after_request
+def record_stage_timings(response):
+    """
+    请求结束时记录各阶段耗时；这个函数在响应压缩（compress_response）之后执行，压缩也计入
+    流式响应的内容在返回之后才逐块生成，生成和发送的时间不在统计之内
+    """
+    timer = getattr(stage_context, 'timer', None)
+    stage_context.timer = None
+    if timer is None:
+        return response
+    timer.finish()
+    if timer.stages:
+        response.headers['Server-Timing'] = timer.server_timing()
+    timer.observe(request.endpoint or 'unknown')
+    return response
+
+
+# 页面上超过这个大小的文件使用后台任务处理（字节）
+ASYNC_UPLOAD_BYTES = int(os.environ.get('ASYNC_UPLOAD_BYTES', 4 * 1024 * 1024))
+
+# 后台任务：有界的线程池，排队和运行中的任务总数超过 JOB_QUEUE_SIZE 时拒绝新任务
+# 任务在当前进程中执行，状态同时写入结果存储，多个worker时轮询落到其他worker上也能查到；完成的任务保留 JOB_TTL 秒
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_QUEUE_SIZE = int(os.environ.get('JOB_QUEUE_SIZE', 16))
+JOB_TTL = int(os.environ.get('JOB_TTL', 3600))
+JOB_PUBLISH_INTERVAL = 0.25  # 同一阶段内的进度最多每隔这么久写入一次结果存储（秒）
+job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job')
+jobs = {}
+jobs_lock = threading.Lock()
+
+# 处理阶段和各阶段在总进度中所占的比例
+JOB_STAGES = {
+    'queued': (0, 0),
+    'read': (0, 50),
+    'parse': (50, 70),
+    'aggregate': (70, 85),
+    'render': (85, 100),
+}
+
+# 当前线程正在执行的任务，处理过程中各阶段通过 report_progress 更新它的进度
+job_context = threading.local()
+
+
+def current_job():
+    return getattr(job_context, 'job', None)
+
+
+def report_progress(stage, fraction=0.0):
+    """
+    报告当前任务的处理阶段和阶段内的完成比例（0~1），同时开始这个阶段的计时（见 begin_stage）
+    不在后台任务中时只计时
+    """
+    begin_stage(stage)
+    job = current_job()
+    if job is None:
+        return
+    start, end = JOB_STAGES[stage]
+    with jobs_lock:
+        stage_changed = job['stage'] != stage
+        job['stage'] = stage
+        job['stage_progress'] = round(fraction * 100)
+        job['progress'] = round(start + (end - start) * fraction)
+    publish_job(job, force=stage_changed)
+
+
+def publish_job(job, force=True):
+    """把任务状态写入结果存储；force 为False时距离上次写入不到 JOB_PUBLISH_INTERVAL 秒就跳过"""
+    now = time.monotonic()
+    with jobs_lock:
+        if not force and now - job['published'] < JOB_PUBLISH_INTERVAL:
+            return
+        job['published'] = now
+        record = {key: value for key, value in job.items() if key not in ('body', 'published')}
+        record['body'] = job['body'].decode('utf-8') if job['body'] is not None else None
+    result_store.put_job(job['job_id'], record)
+
+
+class ProgressReader:
+    """包装上传的文件对象，读取时按当前位置报告读取进度"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.size = stream.seek(0, os.SEEK_END) or 1
+        stream.seek(0)
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        report_progress('read', min(self.stream.tell() / self.size, 1.0))
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def create_job(body=None, limit=None):
+    """
+    登记一个任务；body 不为空时表示已经有结果（上传内容命中缓存），任务直接完成
+    limit 不为空时，排队和运行中的任务已达到 limit 个则不登记，返回None
+    （计数和登记在同一次加锁中完成，并发提交不会超过上限）
+    """
+    import uuid
+    now = time.time()
+    job = {
+        'job_id': uuid.uuid4().hex,
+        'status': 'done' if body is not None else 'queued',
+        'stage': 'render' if body is not None else 'queued',
+        'stage_progress': 100 if body is not None else 0,
+        'progress': 100 if body is not None else 0,
+        'body': body,
+        'error': None,
+        'created': now,
+        'finished': now if body is not None else None,
+        'published': 0.0,
+    }
+    with jobs_lock:
+        # 清理过期的已完成任务
+        for job_id in [job_id for job_id, old in jobs.items() if old['finished'] and now - old['finished'] > JOB_TTL]:
+            del jobs[job_id]
+        if limit is not None and sum(1 for old in jobs.values() if old['status'] in ('queued', 'running')) >= limit:
+            return None
+        jobs[job['job_id']] = job
+    publish_job(job)
+    return job
+
+
+def submit_job(uploads, engine, size_order, cache_key):
+    """把处理任务放入线程池，队列已满时返回None"""
+    job = create_job(limit=JOB_QUEUE_SIZE)
+    if job is None:
+        return None
+    job_executor.submit(run_job, job, uploads, engine, size_order, cache_key)
+    return job
+
+
+def run_job(job, uploads, engine, size_order, cache_key):
+    """在线程池中执行处理任务，结果和同步处理一样保存到结果存储，响应内容放入上传缓存"""
+    job_context.job = job
+    stage_context.timer = StageTimer()
+    with jobs_lock:
+        job['status'] = 'running'
+    publish_job(job)
+    try:
+        result_df, file_stats = process_uploads(uploads, engine=engine, size_order=size_order)
+        report_progress('render', 0.5)
+        result = store_result(result_df, file_stats)
+        begin_stage('json')
+        with app.app_context():
+            body = jsonify(result).get_data()
+        result_cache_put(cache_key, result['result_id'], body)
+        with jobs_lock:
+            job.update(status='done', stage_progress=100, progress=100, body=body)
+    except Exception as e:
+        with jobs_lock:
+            job.update(status='failed', error=f'处理文件时出错: {str(e)}')
+    finally:
+        with jobs_lock:
+            job['finished'] = time.time()
+        job_context.job = None
+        publish_job(job)
+        stage_context.timer.observe('job')
+        stage_context.timer = None
+        for _, stream in uploads:
+            stream.close()
+
+
+def job_info(job):
+    """
+    任务状态；完成后附带与同步 /process 相同的结果内容（第一页结果、总行数和 result_id）
+    job 为当前进程中的任务，或者从结果存储中读出的任务状态（body 为文本）
+    """
+    with jobs_lock:
+        info = {
+            'success': job['status'] != 'failed',
+            'job_id': job['job_id'],
+            'status': job['status'],
+            'stage': job['stage'],
+            'stage_progress': job['stage_progress'],
+            'progress': job['progress'],
+            'elapsed': round((job['finished'] or time.time()) - job['created'], 3),
         }
+        if job['error']:
+            info['error'] = job['error']
+        body = job['body']
+    if body is not None:
+        info.update(json.loads(body))
+    return info
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """查询后台任务的状态：status 为 queued/running/done/failed，stage 为当前处理阶段，progress 为总进度百分比"""
+    with jobs_lock:
+        job = jobs.get(job_id)
+    if job is None:
+        # 任务在其他worker中执行
+        job = result_store.get_job(job_id)
+        if job is not None and job['finished'] and time.time() - job['finished'] > JOB_TTL:
+            job = None
+    if job is None:
+        return jsonify({'success': False, 'error': '未找到任务，可能已过期'})
+    return jsonify(job_info(job))
+
+
+# 结果分页：默认每页行数和单页最多行数
+RESULT_PAGE_SIZE = int(os.environ.get('RESULT_PAGE_SIZE', 100))
+RESULT_ROW_HEIGHT = 33  # 页面结果表格的行高（像素），虚拟滚动按固定行高计算位置
+MAX_RESULT_PAGE_SIZE = int(os.environ.get('MAX_RESULT_PAGE_SIZE', 1000))
+
+# 还原后的处理结果：每个进程缓存最近用过的若干个，翻页、查询和下载时不必每次从结果存储中还原整个结果
+RESULT_FRAME_CACHE_SIZE = int(os.environ.get('RESULT_FRAME_CACHE_SIZE', 8))
+result_frames = OrderedDict()
+result_frames_lock = threading.Lock()
+
+
+def get_result(result_id):
+    """
+    取出处理结果，不存在或已过期时返回None
+    缓存中有时只向结果存储确认结果仍然有效并更新访问时间（其他worker可能已经清理了这个结果），不再还原
+    """
+    with result_frames_lock:
+        result_df = result_frames.get(result_id)
+        if result_df is not None:
+            result_frames.move_to_end(result_id)
+    if result_df is not None:
+        if result_store.touch(result_id):
+            return result_df
+        with result_frames_lock:
+            result_frames.pop(result_id, None)
+        return None
+
+    result_df = result_store.get(result_id)
+    if result_df is not None:
+        with result_frames_lock:
+            result_frames[result_id] = result_df
+            while len(result_frames) > RESULT_FRAME_CACHE_SIZE:
+                result_frames.popitem(last=False)
+    return result_df
 
-        # 删除临时文件
-        os.remove(temp_path)
 
-        # 将结果转换为字典列表
-        results = result_df.to_dict('records')
+# 排序后的行顺序缓存：(result_id, sort) -> 行位置数组，翻页时不必每次重新排序
+RESULT_SORT_CACHE_SIZE = int(os.environ.get('RESULT_SORT_CACHE_SIZE', 32))
+result_sort_orders = OrderedDict()
+result_sort_orders_lock = threading.Lock()
 
-        return jsonify({
+
+def result_sort_order(result_id, result_df, sort):
+    """
+    按 sort 指定的列排序后的行位置，列名前加 - 表示降序；相同值保持原来的先后顺序
+    category列按取值排序，而不是按类别编码；数字和文本混在一起的规格编码与分组时一样数字排在前面
+    """
+    key = (result_id, sort)
+    with result_sort_orders_lock:
+        if key in result_sort_orders:
+            result_sort_orders.move_to_end(key)
+            return result_sort_orders[key]
+
+    values = result_df[sort.lstrip('-')].reset_index(drop=True)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = sorted(values.cat.categories, key=lambda value: group_sort_key((value,)))
+        values = values.cat.reorder_categories(categories)
+    order = values.sort_values(ascending=not sort.startswith('-'), kind='stable').index.to_numpy()
+
+    with result_sort_orders_lock:
+        result_sort_orders[key] = order
+        while len(result_sort_orders) > RESULT_SORT_CACHE_SIZE:
+            result_sort_orders.popitem(last=False)
+    return order
+
+
+def result_page(result_df, offset, limit, order=None):
+    """取出一页结果行（字典列表），order 为排序后的行位置"""
+    positions = np.arange(offset, min(offset + limit, len(result_df))) if order is None else order[offset:offset + limit]
+    return result_df.iloc[positions].to_dict('records')
+
+
+@app.route('/results/<result_id>')
+def result_rows(result_id):
+    """分页读取处理结果：offset/limit 指定行区间，sort 指定排序列（列名前加 - 表示降序）"""
+    try:
+        offset = max(int(request.args.get('offset', 0)), 0)
+        limit = min(max(int(request.args.get('limit', RESULT_PAGE_SIZE)), 1), MAX_RESULT_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'offset 和 limit 必须是整数'})
+    sort = request.args.get('sort', '')
+
+    try:
+        result_df = get_result(result_id)
+        if result_df is None:
+            return jsonify({'success': False, 'error': '未找到处理结果，请先上传并处理文件'})
+        if sort and sort.lstrip('-') not in result_df.columns:
+            return jsonify({'success': False, 'error': f'不支持的排序列: {sort.lstrip("-")}'})
+
+        order = result_sort_order(result_id, result_df, sort) if sort else None
+        response = jsonify({
             'success': True,
-            'results': results,
+            'results': result_page(result_df, offset, limit, order),
+            'total': len(result_df),
+            'offset': offset,
+            'limit': limit,
+            'sort': sort,
             'result_id': result_id
         })
+        # 同一个 result_id 的结果不会变化，浏览器可以直接缓存已经读取过的页
+        response.cache_control.private = True
+        response.cache_control.max_age = RESULT_TTL
+        return response
 
     except Exception as e:
-        return jsonify({'success': False, 'error': f'处理文件时出错: {str(e)}'})
+        return jsonify({'success': False, 'error': f'读取处理结果时出错: {str(e)}'})
 
 
-@app.route('/download/excel')
-def download_excel():
-    """下载Excel格式的结果文件"""
+# 查询索引：和结果一起存在结果存储中（其他worker也能用），每个进程再缓存最近用过的若干个
+RESULT_INDEX_CACHE_SIZE = int(os.environ.get('RESULT_INDEX_CACHE_SIZE', 16))
+result_indexes = OrderedDict()
+result_indexes_lock = threading.Lock()
+
+
+def cache_result_index(result_id, index):
+    with result_indexes_lock:
+        result_indexes[result_id] = index
+        result_indexes.move_to_end(result_id)
+        while len(result_indexes) > RESULT_INDEX_CACHE_SIZE:
+            result_indexes.popitem(last=False)
+
+
+def store_result_index(result_id, result_df):
+    """建立结果的查询索引，存入结果存储"""
+    index = ResultIndex.build(result_df)
+    result_store.put_artifact(result_id, 'index', index.to_bytes())
+    cache_result_index(result_id, index)
+    return index
+
+
+def load_result_index(result_id, result_df):
+    """取出结果的查询索引；存储中没有时（例如索引功能上线前保存的结果）现建一次"""
+    with result_indexes_lock:
+        index = result_indexes.get(result_id)
+    if index is not None:
+        return index
+
+    artifact = result_store.get_artifact(result_id, 'index')
+    if artifact is None:
+        return store_result_index(result_id, result_df)
+    index = ResultIndex.from_bytes(artifact['data'])
+    cache_result_index(result_id, index)
+    return index
+
+
+@app.route('/results/<result_id>/search')
+def search_results(result_id):
+    """
+    在处理结果中查询：code 按规格编码前缀，color 按颜色，size 按包含的尺寸，多个条件同时满足；
+    offset/limit 分页，sort 同 /results；rows 为匹配行在结果中的位置
+    """
     try:
-        result_id = request.args.get('result_id')
-        filename = request.args.get('filename', '备货单汇总')
+        offset = max(int(request.args.get('offset', 0)), 0)
+        limit = min(max(int(request.args.get('limit', RESULT_PAGE_SIZE)), 1), MAX_RESULT_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'offset 和 limit 必须是整数'})
+    sort = request.args.get('sort', '')
 
-        if not result_id or result_id not in processed_data_store:
+    try:
+        result_df = get_result(result_id)
+        if result_df is None:
             return jsonify({'success': False, 'error': '未找到处理结果，请先上传并处理文件'})
+        if sort and sort.lstrip('-') not in result_df.columns:
+            return jsonify({'success': False, 'error': f'不支持的排序列: {sort.lstrip("-")}'})
 
-        # 从存储中获取处理结果
-        result_data = processed_data_store[result_id]
-        result_df = pd.DataFrame(result_data['dataframe'])
+        rows = load_result_index(result_id, result_df).search(
+            code=request.args.get('code'),
+            color=request.args.get('color'),
+            size=request.args.get('size')
+        )
+        if sort:
+            order = result_sort_order(result_id, result_df, sort)
+            rows = order[np.isin(order, rows, assume_unique=True)]
 
-        # 创建Excel文件
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            result_df.to_excel(writer, index=False, sheet_name='汇总结果')
+        page_rows = rows[offset:offset + limit]
+        response = jsonify({
+            'success': True,
+            'results': result_df.iloc[page_rows].to_dict('records'),
+            'rows': page_rows.tolist(),
+            'total': len(rows),
+            'offset': offset,
+            'limit': limit,
+            'sort': sort,
+            'result_id': result_id
+        })
+        response.cache_control.private = True
+        response.cache_control.max_age = RESULT_TTL
+        return response
 
-            # 获取工作表并调整列宽
-            worksheet = writer.sheets['汇总结果']
-            for idx, col in enumerate(result_df.columns):
-                max_length = max(result_df[col].astype(str).str.len().max(), len(col)) + 2
-                worksheet.column_dimensions[get_column_letter(idx + 1)].width = max_length
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'查询处理结果时出错: {str(e)}'})
 
-        output.seek(0)
 
-        return send_file(
-            output,
-            as_attachment=True,
-            download_name=f'{filename}.xlsx',
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
+def render_excel(result_df):
+    """生成Excel格式的结果文件内容"""
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        result_df.to_excel(writer, index=False, sheet_name='汇总结果')
+
+        # 获取工作表并调整列宽
+        worksheet = writer.sheets['汇总结果']
+        for idx, col in enumerate(result_df.columns):
+            max_length = max(result_df[col].astype(str).str.len().max(), len(col)) + 2
+            worksheet.column_dimensions[openpyxl.utils.get_column_letter(idx + 1)].width = max_length
+
+    return output.getvalue()
+
+
+def render_csv(result_df):
+    """生成CSV格式的结果文件内容（带BOM，Excel打开中文不乱码）"""
+    output = BytesIO()
+    result_df.to_csv(output, index=False, encoding='utf-8-sig')
+    return output.getvalue()
+
+
+def stream_csv(result_df, batch_rows=5000):
+    """逐批生成CSV内容，与 render_csv 的输出逐字节相同：先发BOM和表头，再每批行单独转换"""
+    yield '\ufeff'.encode('utf-8') + result_df.iloc[:0].to_csv(index=False).encode('utf-8')
+    for start in range(0, len(result_df), batch_rows):
+        yield result_df.iloc[start:start + batch_rows].to_csv(index=False, header=False).encode('utf-8')
+
+
+def stream_excel(result_df):
+    """逐块生成Excel内容（常量内存的xlsx写入）"""
+    return stream_xlsx(result_df, sheet_name='汇总结果')
+
+
+# 导出格式：扩展名 -> (生成函数, 流式生成函数, MIME类型)
+EXPORT_FORMATS = {
+    'xlsx': (render_excel, stream_excel, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': (render_csv, stream_csv, 'text/csv'),
+}
+
+
+# 结果行数达到这个值时改为流式导出：边生成边发送，不在内存中生成整个文件，也不缓存导出文件
+STREAM_EXPORT_ROWS = int(os.environ.get('STREAM_EXPORT_ROWS', 20000))
+
+
+class ChunkStream(RawIOBase):
+    """把逐块生成的字节包装成只读文件对象，交给 send_file 按块发送"""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.pending = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.pending:
+            self.pending = next(self.chunks, None)
+            if self.pending is None:
+                self.pending = b''
+                return 0
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+
+def send_export(extension):
+    """
+    发送导出文件，带 ETag/Last-Modified，条件请求内容未变化时返回304；只有下载文件名随请求变化
+    每个结果的每种格式只生成一次，和结果一起缓存在结果存储中；
+    行数较多（或指定 stream=1）的结果改为流式生成，不缓存，ETag由result_id确定
+    """
+    result_id = request.args.get('result_id')
+    filename = request.args.get('filename', '备货单汇总')
+    render, stream, mimetype = EXPORT_FORMATS[extension]
+
+    # 从存储中获取处理结果
+    begin_stage('load')
+    artifact = result_store.get_artifact(result_id, extension) if result_id else None
+    if artifact is None:
+        result_df = get_result(result_id) if result_id else None
+        if result_df is None:
+            return jsonify({'success': False, 'error': '未找到处理结果，请先上传并处理文件'})
+
+        # 流式导出的内容在响应发送时才生成，不计入 export 阶段
+        begin_stage('export')
+        if len(result_df) >= STREAM_EXPORT_ROWS or request.args.get('stream') == '1':
+            return send_file(
+                ChunkStream(stream(result_df)),
+                as_attachment=True,
+                download_name=f'{filename}.{extension}',
+                mimetype=mimetype,
+                etag=f'{result_id}-stream.{extension}',
+                conditional=True
+            )
+
+        artifact = result_store.put_artifact(result_id, extension, render(result_df))
+
+    return send_file(
+        BytesIO(artifact['data']),
+        as_attachment=True,
+        download_name=f'{filename}.{extension}',
+        mimetype=mimetype,
+        etag=artifact['etag'],
+        last_modified=artifact['modified'],
+        conditional=True
+    )
+
+
+# 响应压缩：JSON和CSV按 Accept-Encoding 协商 br（需要安装 brotli）或 gzip
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))  # 小于这个长度的响应不压缩；流式响应长度未知，总是压缩
+COMPRESS_MIMETYPES = {'application/json', 'text/csv'}
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', 5))
+
+
+def brotli_available():
+    """是否安装了 brotli"""
+    return importlib.util.find_spec('brotli') is not None
+
+
+def negotiate_encoding(accept_encodings):
+    """按客户端 Accept-Encoding 的权重选择压缩方式，权重相同时优先br；都不接受时返回None"""
+    encodings = ['br', 'gzip'] if brotli_available() else ['gzip']
+    encoding = max(encodings, key=lambda name: accept_encodings[name])
+    return encoding if accept_encodings[encoding] > 0 else None
+
+
+def compress_chunks(chunks, encoding):
+    """逐块压缩响应内容，结束后关闭原来的响应体（例如 send_file 打开的文件）"""
+    if encoding == 'br':
+        import brotli
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        compress, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        compress, finish = compressor.compress, compressor.flush
+    try:
+        for chunk in chunks:
+            data = compress(chunk)
+            if data:
+                yield data
+        yield finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+@app.after_request
+def compress_response(response):
+    """压缩JSON和CSV响应；已知长度的响应一次压缩，流式响应边生成边压缩"""
+    if response.mimetype not in COMPRESS_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    if response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return response
+    if response.content_length is not None and response.content_length < COMPRESS_MIN_BYTES:
+        return response
+    encoding = negotiate_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    begin_stage('compress')
+    if response.is_streamed or response.direct_passthrough:
+        response.response = compress_chunks(response.response, encoding)
+        response.direct_passthrough = False
+        del response.headers['Content-Length']
+    else:
+        response.set_data(b''.join(compress_chunks([response.get_data()], encoding)))
+    response.headers['Content-Encoding'] = encoding
+    # 压缩后的内容与原内容字节不同，ETag改为弱校验（If-None-Match 按弱比较，仍然可以返回304），也不再支持按字节范围请求
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    response.headers.pop('Accept-Ranges', None)
+    return response
+
+
+@app.route('/download/excel')
+@profiled
+def download_excel():
+    """下载Excel格式的结果文件"""
+    try:
+        return send_export('xlsx')
 
     except Exception as e:
         return jsonify({'success': False, 'error': f'下载文件时出错: {str(e)}'})
 
 
 @app.route('/download/csv')
+@profiled
 def download_csv():
     """下载CSV格式的结果文件"""
     try:
-        result_id = request.args.get('result_id')
-        filename = request.args.get('filename', '备货单汇总')
+        return send_export('csv')
 
-        if not result_id or result_id not in processed_data_store:
-            return jsonify({'success': False, 'error': '未找到处理结果，请先上传并处理文件'})
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'下载文件时出错: {str(e)}'})
 
-        # 从存储中获取处理结果
-        result_data = processed_data_store[result_id]
-        result_df = pd.DataFrame(result_data['dataframe'])
 
-        # 创建CSV文件
-        output = BytesIO()
-        result_df.to_csv(output, index=False, encoding='utf-8-sig')
-        output.seek(0)
+@app.route('/stats/shipping-tags')
+def shipping_tag_stats():
+    """查看时间标记规则及每条规则的命中次数"""
+    with shipping_tag_hits_lock:
+        hits = dict(shipping_tag_hits)
+    return jsonify({
+        'success': True,
+        'rules': [dict(rule, hits=hits.get(rule['name'], 0)) for rule in SHIPPING_TAG_RULES]
+    })
 
-        return send_file(
-            output,
-            as_attachment=True,
-            download_name=f'{filename}.csv',
-            mimetype='text/csv'
-        )
+
+@app.route('/stats/result-cache')
+def result_cache_info():
+    """查看上传结果缓存的命中情况和占用大小"""
+    with result_cache_lock:
+        stats = dict(result_cache_stats, entries=len(result_cache), max_bytes=RESULT_CACHE_BYTES)
+    return jsonify({'success': True, 'stats': stats})
+
+
+@app.route('/stats/result-store')
+def result_store_info():
+    """查看结果存储的后端、结果数量、占用大小和清理次数"""
+    return jsonify({'success': True, 'stats': result_store.info()})
+
+
+@app.route('/metrics')
+def metrics():
+    """
+    Prometheus 文本格式的运行指标：各处理阶段的耗时和内存峰值、请求耗时、处理行数，
+    以及结果存储、上传结果缓存、规格名称缓存和后台任务的状态
+    """
+    lines = []
+    for histogram in (stage_seconds, stage_peak_bytes, request_seconds, processed_rows):
+        lines += histogram.render()
+
+    with result_cache_lock:
+        cache = dict(result_cache_stats, entries=len(result_cache))
+    lookups = cache['hits'] + cache['misses']
+    lines += render_samples('excel_result_cache_lookups_total', '上传结果缓存的查找次数', 'counter',
+                            [([('result', 'hit')], cache['hits']), ([('result', 'miss')], cache['misses'])])
+    lines += render_samples('excel_result_cache_hit_ratio', '上传结果缓存的命中率', 'gauge',
+                            [([], cache['hits'] / lookups if lookups else 0.0)])
+    lines += render_samples('excel_result_cache_evictions_total', '上传结果缓存移除的项目数', 'counter',
+                            [([], cache['evictions'])])
+    lines += render_samples('excel_result_cache_entries', '上传结果缓存的项目数', 'gauge', [([], cache['entries'])])
+    lines += render_samples('excel_result_cache_bytes', '上传结果缓存的大小（字节）', 'gauge', [([], cache['bytes'])])
+
+    store = result_store.info()
+    backend = [('backend', store['backend'])]
+    lines += render_samples('excel_result_store_entries', '结果存储中的结果数量', 'gauge', [(backend, store['entries'])])
+    lines += render_samples('excel_result_store_bytes', '结果存储的大小（字节）', 'gauge', [(backend, store['bytes'])])
+    lines += render_samples('excel_result_store_removed_total', '结果存储因过期或超出容量移除的结果数', 'counter',
+                            [(backend + [('reason', 'expired')], store['expired']),
+                             (backend + [('reason', 'evicted')], store['evicted'])])
+
+    with spec_name_cache_lock:
+        spec_entries = len(spec_name_cache)
+    with result_indexes_lock:
+        index_entries = len(result_indexes)
+    lines += render_samples('excel_spec_name_cache_entries', '已解析规格名称缓存的项目数', 'gauge', [([], spec_entries)])
+    lines += render_samples('excel_result_index_cache_entries', '内存中查询索引的数量', 'gauge', [([], index_entries)])
+    with result_frames_lock:
+        frame_entries = len(result_frames)
+    lines += render_samples('excel_result_frame_cache_entries', '内存中已还原结果的数量', 'gauge', [([], frame_entries)])
+
+    with jobs_lock:
+        job_statuses = Counter(job['status'] for job in jobs.values())
+    lines += render_samples('excel_jobs', '后台任务数量', 'gauge',
+                            [([('status', status)], job_statuses[status])
+                             for status in ('queued', 'running', 'done', 'failed')])
+
+    return app.response_class('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# 预热结果：第一次预热各步骤的耗时（秒），之后的预热请求直接返回
+warm_up_timings = None
+warm_up_lock = threading.Lock()
+
+
+def warm_up():
+    """
+    导入 pandas、numpy、openpyxl，并用一行示例数据走一遍解析、汇总和Excel导出
+    冷启动后第一个处理请求不用再等这些导入和初始化，返回 (是否已经预热过, 各步骤耗时)
+    """
+    global warm_up_timings
+    with warm_up_lock:
+        if warm_up_timings is not None:
+            return True, warm_up_timings
+
+        timings = {}
+        started = time.perf_counter()
+        sample = pd.DataFrame({'规格编码': ['A001'], '规格名称': ['红色M'], '规格数量': [1]})
+        timings['import'] = round(time.perf_counter() - started, 3)
+
+        started = time.perf_counter()
+        result_df = summarize_groups(group_spec_frame(sample))
+        timings['process'] = round(time.perf_counter() - started, 3)
+
+        started = time.perf_counter()
+        render_excel(result_df)
+        timings['render'] = round(time.perf_counter() - started, 3)
+
+        warm_up_timings = timings
+        return False, timings
+
+
+@app.route('/warmup')
+def warmup():
+    """预热接口：部署平台或定时任务在冷启动后访问一次，提前完成导入和初始化"""
+    try:
+        warm, timings = warm_up()
+        return jsonify({'success': True, 'warm': warm, 'timings': timings})
 
     except Exception as e:
-        return jsonify({'success': False, 'error': f'下载文件时出错: {str(e)}'})
+        return jsonify({'success': False, 'error': f'预热时出错: {str(e)}'})
+
+
+def run_cli(args):
+    """
+    命令行批量处理：python app.py 文件1.xlsx 文件2.csv ... -o 汇总结果.xlsx
+    多个文件与网页上传多个文件一样并行读取后合并汇总，输出格式按输出文件扩展名选择（.xlsx 或 .csv）
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='批量汇总多个备货单文件')
+    parser.add_argument('files', nargs='+', help='要处理的Excel/CSV文件')
+    parser.add_argument('-o', '--output', default='汇总结果.xlsx', help='输出文件（.xlsx 或 .csv）')
+    parser.add_argument('--engine', default='auto', choices=['auto', 'python', *READER_ENGINES], help='读取引擎')
+    parser.add_argument('--size-order', choices=list(SIZE_RANKS), help='尺寸顺序方案')
+    options = parser.parse_args(args)
+
+    extension = os.path.splitext(options.output)[1].lstrip('.').lower()
+    if extension not in EXPORT_FORMATS:
+        parser.error(f'不支持的输出格式: {options.output}')
+
+    files = []
+    for path in options.files:
+        try:
+            with open(path, 'rb') as f:
+                files.append((os.path.basename(path), f.read()))
+        except OSError as e:
+            parser.exit(1, f'无法读取文件 {path}: {e.strerror}\n')
+
+    try:
+        result_df, file_stats = process_excel_batch(files, engine=options.engine, size_order=options.size_order)
+    except ValueError as e:
+        parser.exit(1, f'{e}\n')
+
+    for stats in file_stats:
+        print(f"{stats['filename']}: {stats['rows']} 行，{stats['groups']} 组，"
+              f"引擎 {stats['engine']}，耗时 {stats['seconds']} 秒")
+
+    render = EXPORT_FORMATS[extension][0]
+    with open(options.output, 'wb') as f:
+        f.write(render(result_df))
+    print(f'共 {len(result_df)} 条汇总结果，结果已保存到 {options.output}')
 
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=7100)
\ No newline at end of file
+    if len(sys.argv) > 1:
+        run_cli(sys.argv[1:])
+    else:
+        app.run(debug=True, host='0.0.0.0', port=7100)
\ No newline at end of file
@@ -0,0 +1,232 @@
+"""
+性能测试：生成模拟备货单，测量各处理阶段的耗时和内存
+用法：python bench.py [行数]
+冷启动测试：python bench.py --cold-start [次数]，每次启动新的Python进程测量导入和第一批请求的耗时
+引擎一致性检查：python bench.py --check-engines [轮数]，纯Python引擎和其他可能自动选择的引擎与pandas引擎处理同样的模拟文件，结果必须完全相同
+批量合并检查：python bench.py --check-batch [轮数]，多个文件合并汇总的结果必须与把所有文件的行放在一起汇总相同
+"""
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+import app
+
+COLORS = ['红色', '黑色', '白色', '深蓝', '浅灰', '米白', '酒红', '卡其', '藏青', '杏色']
+SIZES = ['S', 'M', 'L', 'XL', '2XL', '3XL', '4XL', 'M 1', 'L 2', '90', '100', '110']
+TAGS = ['', '48小时内发货', ' 72小时内发货', '一周内发货', '3天内发货', ';48小时内发货']
+
+
+def generate_rows(row_count, seed=0):
+    """生成模拟备货单：约两千个规格编码，规格名称由颜色、尺寸和时间标记组合而成"""
+    rnd = random.Random(seed)
+    codes = [f'SKU{index:05d}' for index in range(2000)]
+    return pd.DataFrame({
+        '规格编码': [rnd.choice(codes) for _ in range(row_count)],
+        '规格名称': [rnd.choice(COLORS) + rnd.choice(['', ' ']) + rnd.choice(SIZES) + rnd.choice(TAGS)
+                 for _ in range(row_count)],
+        '规格数量': [rnd.randint(1, 20) for _ in range(row_count)],
+        '商品名称': ['测试商品'] * row_count,
+    })
+
+
+def generate_edge_rows(row_count, seed=0):
+    """
+    在模拟备货单中加入边界情况：空值、缺失值文本（NA）、空字符串、规格名称开头的空白、
+    数字规格编码（整数、整数混合空值、数字和文本混合）
+    """
+    rnd = random.Random(seed)
+    df = generate_rows(row_count, seed)
+    df['规格名称'] = [rnd.choice(['', '', ' ']) + name + rnd.choice(['', '', '均码', ' 1']) for name in df['规格名称']]
+    if seed % 3 == 1:
+        df['规格编码'] = [int(code[3:]) for code in df['规格编码']]
+    elif seed % 3 == 2:
+        df['规格编码'] = [int(code[3:]) if rnd.random() < 0.5 else code for code in df['规格编码']]
+    df = df.astype(object)
+    for index in rnd.sample(range(row_count), row_count // 20):
+        df.at[index, rnd.choice(['规格编码', '规格名称', '规格数量'])] = rnd.choice([None, 'NA', ''])
+    return df
+
+
+def check_engines(rounds, row_count=300):
+    """
+    引擎一致性检查：每轮生成一份带边界情况的模拟备货单，分别保存为xlsx、CSV、GBK编码的CSV和TSV，
+    纯Python引擎和自动选择时可能用到的其他引擎（xlsx的openpyxl只读模式和calamine）的处理结果
+    都与pandas引擎的结果用 assert_frame_equal 比较（值、类型、类别都必须相同），返回是否全部一致
+    """
+    xlsx_engines = ['python', 'openpyxl_readonly'] + (['calamine'] if app.calamine_available() else [])
+    cases = [('xlsx', 'openpyxl', xlsx_engines, {}),
+             ('csv', 'csv', ['python'], {'encoding': 'utf-8-sig'}),
+             ('csv', 'csv', ['python'], {'encoding': 'gb18030'}),
+             ('tsv', 'tsv', ['python'], {'sep': '\t'})]
+    failures = 0
+    with tempfile.TemporaryDirectory() as directory:
+        for seed in range(rounds):
+            df = generate_edge_rows(row_count, seed)
+            size_order = 'legacy' if seed % 4 == 3 else None
+            for extension, engine, other_engines, options in cases:
+                path = os.path.join(directory, f'check.{extension}')
+                if extension == 'xlsx':
+                    df.to_excel(path, index=False)
+                else:
+                    df.to_csv(path, index=False, **options)
+
+                app.spec_name_cache.clear()
+                expected = app.process_excel_data(path, engine=engine, size_order=size_order)
+                for name in other_engines:
+                    app.spec_name_cache.clear()
+                    try:
+                        pd.testing.assert_frame_equal(
+                            app.process_excel_data(path, engine=name, size_order=size_order), expected
+                        )
+                    except Exception as e:
+                        failures += 1
+                        print(f'第{seed}轮 {extension}（{options}）{name} 引擎与 {engine} 引擎结果不一致:\n{e}')
+
+    print(f'引擎一致性检查: {rounds} 轮，每轮 {len(cases)} 种文件，不一致 {failures} 次')
+    return failures == 0
+
+
+def check_batch(rounds, row_count=300):
+    """
+    批量合并检查：每轮把两份带边界情况的模拟备货单拆成三个xlsx文件（同一编码在不同文件中可能是整数、
+    有空值时被读成的浮点数或文本），分别用自动选择的引擎和纯Python引擎批量处理，
+    结果与读出所有文件的行、统一规格编码后一次汇总的结果比较，
+    另外检查一个文件编码全是整数、另一个文件编码有空值的固定例子，返回是否全部一致
+    """
+    fixed = [
+        pd.DataFrame({'规格编码': [1001, 1002], '规格名称': ['红色M', '红色M'], '规格数量': [1, 2]}),
+        pd.DataFrame({'规格编码': [1001, None], '规格名称': ['红色M', '红色M'], '规格数量': [3, 4]}),
+    ]
+    cases = [fixed]
+    for seed in range(rounds):
+        df = pd.concat([generate_edge_rows(row_count, seed), generate_edge_rows(row_count, seed + 1)], ignore_index=True)
+        cases.append([df.iloc[start:start + row_count * 2 // 3] for start in range(0, len(df), row_count * 2 // 3)])
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as directory:
+        for round_index, parts in enumerate(cases):
+            files = []
+            frames = []
+            for index, part in enumerate(parts):
+                path = os.path.join(directory, f'batch{index}.xlsx')
+                part.to_excel(path, index=False)
+                with open(path, 'rb') as f:
+                    files.append((f'batch{index}.xlsx', f.read()))
+                frames.append(pd.read_excel(path, usecols=app.SPEC_COLUMNS))
+
+            results = []
+            for engine in ['auto', 'python']:
+                app.spec_name_cache.clear()
+                results.append(app.process_excel_batch(files, engine=engine)[0])
+            # 规格编码为空的行不参与分组，先去掉，否则空值会让整数编码的类别变成浮点数
+            rows = pd.concat(frames, ignore_index=True).dropna(subset=['规格编码']).reset_index(drop=True)
+            rows['规格编码'] = app.canonical_codes(rows['规格编码'])
+            app.spec_name_cache.clear()
+            expected = app.summarize_groups(app.group_spec_frame(rows))
+            for engine, result_df in zip(['auto', 'python'], results):
+                try:
+                    pd.testing.assert_frame_equal(result_df, expected)
+                except AssertionError as e:
+                    failures += 1
+                    print(f'第{round_index}组文件（{engine} 引擎）合并结果不一致:\n{e}')
+
+    print(f'批量合并检查: {len(cases)} 组文件，不一致 {failures} 次')
+    return failures == 0
+
+
+def measure(label, func, *args):
+    """运行两次：第一次只计时，第二次用tracemalloc统计峰值内存（tracemalloc会拖慢运行）"""
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f'{label:<24}{elapsed * 1000:>10.1f} ms{peak / 1024 / 1024:>10.1f} MB')
+    return result
+
+
+def run_pipeline(df):
+    """解析、两次分组和生成结果（不含文件读取）"""
+    app.spec_name_cache.clear()
+    return app.summarize_groups(app.group_spec_frame(df.copy()))
+
+
+# 冷启动预算（毫秒）：导入app加上第一个 GET / 的耗时中位数超过预算时以非0状态退出
+COLD_START_BUDGET_MS = int(os.environ.get('COLD_START_BUDGET_MS', 400))
+
+# 在新进程中执行：导入app，依次发出第一批请求，输出各步骤耗时（秒）和 GET / 之后是否已经导入了pandas
+COLD_START_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import app
+timings = {'import': time.perf_counter() - started}
+client = app.app.test_client()
+
+started = time.perf_counter()
+client.get('/')
+timings['GET /'] = time.perf_counter() - started
+timings['pandas_loaded'] = 'pandas.core.frame' in sys.modules
+
+with open(sys.argv[1], 'rb') as f:
+    started = time.perf_counter()
+    client.post('/process', data={'file': (f, 'bench.xlsx')})
+    timings['POST /process'] = time.perf_counter() - started
+print(json.dumps(timings))
+"""
+
+
+def cold_start(runs):
+    """启动 runs 个新进程测量冷启动，输出每一步的中位数，返回是否在预算之内"""
+    with tempfile.TemporaryDirectory() as directory:
+        sample_path = os.path.join(directory, 'bench.xlsx')
+        generate_rows(1000).to_excel(sample_path, index=False)
+        samples = [
+            json.loads(subprocess.run(
+                [sys.executable, '-c', COLD_START_SCRIPT, sample_path],
+                cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+            ).stdout.splitlines()[-1])
+            for _ in range(runs)
+        ]
+
+    print(f'冷启动次数: {runs}')
+    for step in ['import', 'GET /', 'POST /process']:
+        print(f'{step:<24}{statistics.median(sample[step] for sample in samples) * 1000:>10.1f} ms')
+
+    startup_ms = statistics.median(sample['import'] + sample['GET /'] for sample in samples) * 1000
+    print(f'{"导入+首页":<24}{startup_ms:>10.1f} ms（预算 {COLD_START_BUDGET_MS} ms）')
+    if any(sample['pandas_loaded'] for sample in samples):
+        print('GET / 之后已经导入了pandas，重量级库没有延迟导入')
+        return False
+    return startup_ms <= COLD_START_BUDGET_MS
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--cold-start':
+        sys.exit(0 if cold_start(int(sys.argv[2]) if len(sys.argv) > 2 else 5) else 1)
+    if len(sys.argv) > 1 and sys.argv[1] == '--check-engines':
+        sys.exit(0 if check_engines(int(sys.argv[2]) if len(sys.argv) > 2 else 20) else 1)
+    if len(sys.argv) > 1 and sys.argv[1] == '--check-batch':
+        sys.exit(0 if check_batch(int(sys.argv[2]) if len(sys.argv) > 2 else 10) else 1)
+
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    df = generate_rows(row_count)
+    print(f'行数: {row_count}')
+    measure('解析+分组汇总', run_pipeline, df)
+
+    # 分组键列的内存（category类型只保存整数编码和一份类别）
+    parsed = app.parse_spec_names(df['规格名称'])
+    key_memory = parsed[['颜色', '标准化尺寸']].memory_usage(deep=True).sum()
+    key_memory += df['规格编码'].astype('category').memory_usage(deep=True)
+    print(f'{"分组键列内存":<24}{key_memory / 1024 / 1024:>10.1f} MB')
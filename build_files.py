@@ -1,5 +1,8 @@
 import os
+import re
 import shutil
+import sys
+import urllib.request
 
 # 确保必要的目录存在
 os.makedirs('/tmp/vercel_pandas', exist_ok=True)
@@ -8,4 +11,32 @@ os.makedirs('/tmp/vercel_pandas', exist_ok=True)
 if os.path.exists('app.py'):
     shutil.copy('app.py', '/tmp/')
 
-print("Build completed successfully")
\ No newline at end of file
+
+def download_vendor_assets():
+    """
+    把页面用到的 Bootstrap、Font Awesome 下载到 VENDOR_DIR，之后页面改为由本站 /vendor 提供这些文件
+    Font Awesome 的CSS引用的字体文件（../webfonts/...）一并下载
+    """
+    from app import VENDOR_ASSETS, VENDOR_DIR
+
+    downloads = {path: url for path, url in VENDOR_ASSETS.values()}
+    for path, url in list(downloads.items()):
+        if path.endswith('.css'):
+            with urllib.request.urlopen(url) as response:
+                css = response.read().decode('utf-8')
+            for font in set(re.findall(r'url\(\.\./webfonts/([^)?#]+)', css)):
+                downloads[f'{os.path.dirname(os.path.dirname(path))}/webfonts/{font}'] = \
+                    f'{os.path.dirname(os.path.dirname(url))}/webfonts/{font}'
+
+    for path, url in sorted(downloads.items()):
+        target = os.path.join(VENDOR_DIR, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with urllib.request.urlopen(url) as response, open(target, 'wb') as f:
+            shutil.copyfileobj(response, f)
+        print(f'已下载 {url} -> {target}')
+
+
+if '--vendor' in sys.argv[1:]:
+    download_vendor_assets()
+
+print("Build completed successfully")
@@ -0,0 +1,20 @@
+"""
+延迟导入：pandas、numpy、openpyxl 导入要几百毫秒，Vercel 每次冷启动都要付出这个时间
+各模块通过 lazy_import 取得这些库，第一次用到其中的属性时才真正导入，只返回页面的请求不再等待这些库
+注意：已经延迟导入的模块不能再用 import 语句导入（import 会访问模块属性，立即触发真正的导入），要用 lazy_import
+"""
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """返回延迟导入的模块：先放一个占位模块到 sys.modules，第一次访问其属性时才执行导入"""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
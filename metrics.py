@@ -0,0 +1,80 @@
+"""
+运行指标：直方图按标签累计观测值，按 Prometheus 文本格式输出（/metrics）
+只实现用到的部分（直方图和即时值），不依赖 prometheus_client
+"""
+import math
+import threading
+
+# 处理阶段耗时的分桶（秒）
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# 处理阶段内存峰值的分桶（字节）
+BYTES_BUCKETS = tuple(2 ** power for power in range(16, 32, 2))  # 64KB ~ 1GB
+
+# 行数的分桶
+ROWS_BUCKETS = (10, 100, 500, 1000, 2000, 5000, 10000, 50000, 100000, 500000, 1000000)
+
+
+def format_value(value):
+    """按 Prometheus 文本格式输出数值：整数不带小数点，无穷大写作 +Inf"""
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def escape_label_value(value):
+    """标签值中的反斜杠、双引号和换行需要转义"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    """标签写成 {name="value",...}"""
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label_value(value)}"' for name, value in labels) + '}'
+
+
+class Histogram:
+    """按标签分组的直方图：每组记录各分桶的累计次数、观测值总和和次数"""
+
+    def __init__(self, name, help_text, buckets, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets) + (math.inf,)
+        self.label_names = tuple(label_names)
+        self.series = {}  # 标签值 -> [各分桶次数, 总和, 次数]
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = sorted(self.series.items())
+        for label_values, (counts, total, count) in series:
+            labels = list(zip(self.label_names, label_values))
+            for bound, bucket_count in zip(self.buckets, counts):
+                bucket_labels = format_labels(labels + [('le', format_value(float(bound)))])
+                lines.append(f'{self.name}_bucket{bucket_labels} {bucket_count}')
+            lines.append(f'{self.name}_sum{format_labels(labels)} {format_value(total)}')
+            lines.append(f'{self.name}_count{format_labels(labels)} {count}')
+        return lines
+
+
+def render_samples(name, help_text, metric_type, samples):
+    """输出即时值（gauge 或 counter）：samples 为 [(标签列表, 数值)]"""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}']
+    for labels, value in samples:
+        lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+    return lines
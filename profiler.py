@@ -0,0 +1,77 @@
+"""
+采样分析器：后台线程按固定间隔读取被分析线程的调用栈，统计每个调用栈出现的次数
+结果可以输出为火焰图工具（flamegraph.pl、speedscope）使用的折叠栈格式，也可以汇总为按函数统计的表格
+只用标准库，只在分析时运行，不影响其他请求
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+def frame_label(code):
+    """调用栈中一层的名称：函数名（文件名:行号），折叠栈格式用分号分隔各层，名称中不能有分号"""
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'.replace(';', ':')
+
+
+class SamplingProfiler:
+    """对一个线程采样，interval 为采样间隔（秒），超过 max_seconds 后不再采样"""
+
+    def __init__(self, thread_id, interval=0.005, max_seconds=300):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.samples = Counter()  # 调用栈（从外到内的各层名称）-> 次数
+        self.stopped = threading.Event()
+        self.thread = None
+        self.started = None
+        self.seconds = 0.0
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.thread = threading.Thread(target=self.run, name='profiler', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.seconds = time.perf_counter() - self.started
+
+    def run(self):
+        deadline = self.started + self.max_seconds
+        while not self.stopped.wait(self.interval) and time.perf_counter() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.samples[tuple(reversed(stack))] += 1
+
+    def collapsed(self):
+        """折叠栈格式：每行为 "外层;...;内层 次数"，可以直接交给 flamegraph.pl 或 speedscope"""
+        return ''.join(f'{";".join(stack)} {count}\n' for stack, count in self.samples.most_common())
+
+    def top(self, limit=30):
+        """
+        按函数汇总：self 为函数自身在栈顶的采样次数，total 为函数出现在栈中的采样次数（递归只算一次）
+        按 self 从多到少取前 limit 个
+        """
+        own = Counter()
+        total = Counter()
+        for stack, count in self.samples.items():
+            own[stack[-1]] += count
+            for label in set(stack):
+                total[label] += count
+        sample_count = sum(self.samples.values()) or 1
+        return [
+            {
+                'function': label,
+                'self': own[label],
+                'total': total[label],
+                'self_percent': round(own[label] * 100 / sample_count, 1),
+                'total_percent': round(total[label] * 100 / sample_count, 1),
+            }
+            for label in sorted(total, key=lambda label: (-own[label], -total[label]))[:limit]
+        ]
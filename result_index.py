@@ -0,0 +1,142 @@
+"""
+处理结果的查询索引：保存结果时建立一次，查询时只查索引，不再扫描结果
+规格编码：按编码排序的数组，二分查找前缀；颜色、尺寸：倒排索引（取值 -> 行号数组）
+匹配时不区分大小写，首尾空白忽略
+"""
+from bisect import bisect_left
+
+from lazy_modules import lazy_import
+from result_store import pack, unpack
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# 尺寸数量列中各尺寸之间的分隔符，如 "S*9，M*62"
+SIZE_SEPARATOR = '，'
+
+
+def normalize_key(values):
+    """索引和查询使用同样的规范化：去掉首尾空白并忽略大小写"""
+    return values.astype(str).str.strip().str.casefold()
+
+
+def factorize_keys(values):
+    """
+    按规范化后的取值编码，返回 (每行的编码, 规范化后的不重复取值)
+    只对不重复的取值做规范化，汇总结果里同一个规格编码、颜色会出现在很多行
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    key_codes, keys = pd.factorize(normalize_key(pd.Series(uniques)))
+    return key_codes[codes], keys.to_numpy()
+
+
+def inverted_index(codes, keys):
+    """取值 -> 升序行号数组，codes 为每行取值在 keys 中的编码"""
+    order = np.argsort(codes, kind='stable')
+    groups = np.split(order, np.cumsum(np.bincount(codes, minlength=len(keys)))[:-1])
+    return dict(zip(keys, groups))
+
+
+def size_index(values):
+    """
+    尺寸 -> 包含该尺寸的升序行号数组
+    尺寸数量（"S*9，M*62"）按不重复的取值拆分，拆出的各段再按不重复的段取尺寸，最后按取值编码找出对应的行
+    """
+    codes, texts = pd.factorize(values.astype(str))
+    if not len(texts):
+        return {}
+    parts = np.array(SIZE_SEPARATOR.join(texts).split(SIZE_SEPARATOR), dtype=object)
+    owners = np.repeat(np.arange(len(texts)), [text.count(SIZE_SEPARATOR) + 1 for text in texts])
+
+    part_codes, unique_parts = pd.factorize(parts)
+    unique_parts = pd.Series(unique_parts, dtype=object)
+    size_codes, sizes = pd.factorize(normalize_key(unique_parts.str.rpartition('*')[0]))
+    part_sizes = size_codes[part_codes]
+
+    # 空段（例如空字符串）不算尺寸
+    kept = (unique_parts != '').to_numpy()[part_codes]
+    owners, part_sizes = owners[kept], part_sizes[kept]
+
+    order = np.argsort(part_sizes, kind='stable')
+    groups = np.split(owners[order], np.cumsum(np.bincount(part_sizes, minlength=len(sizes)))[:-1])
+    index = {}
+    for size, text_codes in zip(sizes, groups):
+        if len(text_codes):
+            contains = np.zeros(len(texts), dtype=bool)
+            contains[text_codes] = True
+            index[size] = np.flatnonzero(contains[codes])
+    return index
+
+
+class ResultIndex:
+    """一个处理结果的查询索引"""
+
+    def __init__(self, length, codes, code_rows, colors, sizes):
+        self.length = length
+        self.codes = codes          # 规范化后排好序的规格编码（列表，二分查找）
+        self.code_rows = code_rows  # 与 codes 对应的行号
+        self.colors = colors        # 颜色 -> 行号数组
+        self.sizes = sizes          # 尺寸 -> 行号数组
+
+    @classmethod
+    def build(cls, result_df):
+        """从汇总结果建立索引：规格编码、颜色各一列，尺寸从尺寸数量列（"S*9，M*62"）中拆出"""
+        key_codes, keys = factorize_keys(result_df['规格编码'])
+        codes = keys[key_codes]
+        order = np.argsort(codes, kind='stable')
+
+        return cls(
+            len(result_df),
+            codes[order].tolist(),
+            order,
+            inverted_index(*factorize_keys(result_df['颜色'])),
+            size_index(result_df['尺寸数量']),
+        )
+
+    def match_code(self, prefix):
+        """规格编码以 prefix 开头的行"""
+        prefix = prefix.strip().casefold()
+        start = bisect_left(self.codes, prefix)
+        stop = bisect_left(self.codes, prefix + chr(0x10FFFF), lo=start)
+        return np.sort(self.code_rows[start:stop])
+
+    def match_color(self, color):
+        """颜色等于 color 的行"""
+        return self.colors.get(color.strip().casefold(), np.empty(0, dtype=np.intp))
+
+    def match_size(self, size):
+        """包含尺寸 size 的行"""
+        return self.sizes.get(size.strip().casefold(), np.empty(0, dtype=np.intp))
+
+    def search(self, code=None, color=None, size=None):
+        """同时满足所有给出条件的行号（升序）；没有给出任何条件时返回全部行"""
+        matches = []
+        if code:
+            matches.append(self.match_code(code))
+        if color:
+            matches.append(self.match_color(color))
+        if size:
+            matches.append(self.match_size(size))
+        if not matches:
+            return np.arange(self.length)
+
+        # 从最少的一组行开始，用其余各组的行标记逐个筛选，结果保持升序
+        matches.sort(key=len)
+        rows = matches[0]
+        for other in matches[1:]:
+            selected = np.zeros(self.length, dtype=bool)
+            selected[other] = True
+            rows = rows[selected[rows]]
+        return rows
+
+    def to_bytes(self):
+        """序列化为存储格式（见 result_store.pack）：规格编码和各取值写在JSON头部，行号数组按二进制保存"""
+        meta = {'length': self.length, 'codes': self.codes, 'colors': list(self.colors), 'sizes': list(self.sizes)}
+        return pack(meta, [self.code_rows, *self.colors.values(), *self.sizes.values()])
+
+    @classmethod
+    def from_bytes(cls, data):
+        meta, arrays = unpack(data)
+        colors = dict(zip(meta['colors'], arrays[1:1 + len(meta['colors'])]))
+        sizes = dict(zip(meta['sizes'], arrays[1 + len(meta['colors']):]))
+        return cls(meta['length'], meta['codes'], arrays[0], colors, sizes)
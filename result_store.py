@@ -0,0 +1,711 @@
+"""
+处理结果存储
+memory：进程内字典，只适合单个worker（本地开发、Vercel）
+sqlite：SQLite数据库（WAL模式），directory：磁盘目录，这两种可以在多个worker进程之间共享，
+/process 和 /download 落到不同worker上时也能找到结果
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import stat
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from io import BytesIO
+
+from lazy_modules import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# result_id 只允许字母、数字、下划线和连字符，避免拼接文件路径时越出存储目录
+RESULT_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+# 列式表示中拼接文本列使用的分隔符
+TEXT_SEPARATOR = '\x00'
+
+# 序列化格式的标识：压缩前为 标识 + JSON头部长度 + JSON头部 + 各数组的 .npy 数据（不允许pickle），
+# 多个worker共享的存储被其他人改写时，读取也不会执行任何代码
+PACK_MAGIC = b'COUNT1'
+
+
+def compact_result(result_df):
+    """
+    把结果转换为紧凑的列式表示 {'length': 行数, 'columns': {列名: 编码后的列}}：
+    category列和重复较多的文本列（规格编码、颜色）按字典编码，只保存整数编码数组和一份不重复的取值；
+    其余文本列（尺寸数量、结果）用分隔符拼接为一个UTF-8字节串，不再每行一个Python字符串对象
+    """
+    columns = {}
+    for column in result_df.columns:
+        values = result_df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            columns[column] = ('category', values.cat.codes.to_numpy(), values.cat.categories.to_numpy())
+        elif values.dtype == object and pd.api.types.infer_dtype(values, skipna=False) == 'string':
+            if values.nunique() <= len(values) // 2:
+                codes, categories = pd.factorize(values)
+                columns[column] = ('category', codes, categories.to_numpy())
+            else:
+                text = TEXT_SEPARATOR.join(values)
+                if len(values) and text.count(TEXT_SEPARATOR) == len(values) - 1:
+                    columns[column] = ('text', text.encode('utf-8'))
+                else:
+                    # 文本本身包含分隔符时保持原样
+                    columns[column] = ('array', values.to_numpy())
+        else:
+            columns[column] = ('array', values.to_numpy())
+    return {'length': len(result_df), 'columns': columns}
+
+
+def restore_result(compact):
+    """
+    从 compact_result 的列式表示还原DataFrame
+    字典编码的列直接复用整数编码数组，文本列解码一次，不需要逐行重建
+    """
+    columns = {}
+    for column, encoded in compact['columns'].items():
+        kind = encoded[0]
+        if kind == 'category':
+            columns[column] = pd.Categorical.from_codes(encoded[1], encoded[2])
+        elif kind == 'text':
+            columns[column] = np.array(encoded[1].decode('utf-8').split(TEXT_SEPARATOR), dtype=object)
+        else:
+            columns[column] = encoded[1]
+    return pd.DataFrame(columns, index=pd.RangeIndex(compact['length']))
+
+
+def result_size(compact):
+    """估算列式表示占用的内存字节数"""
+    size = 0
+    for encoded in compact['columns'].values():
+        for part in encoded[1:]:
+            if isinstance(part, bytes):
+                size += len(part)
+            elif part.dtype == object:
+                size += int(pd.Series(part).memory_usage(index=False, deep=True))
+            else:
+                size += part.nbytes
+    return size
+
+
+def plain_value(value):
+    """numpy标量转换为对应的Python值，写入JSON"""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def pack(meta, arrays):
+    """
+    把JSON可以表示的 meta 和一组数组打包为压缩后的字节串
+    arrays 中的元素为数值类型的numpy数组（按 .npy 格式保存）或字节串
+    """
+    blobs = []
+    for array in arrays:
+        if isinstance(array, bytes):
+            blobs.append(('bytes', array))
+        else:
+            buffer = BytesIO()
+            np.save(buffer, array, allow_pickle=False)
+            blobs.append(('npy', buffer.getvalue()))
+    header = json.dumps({'meta': meta, 'blobs': [[kind, len(blob)] for kind, blob in blobs]},
+                        ensure_ascii=False).encode('utf-8')
+    return zlib.compress(PACK_MAGIC + struct.pack('<I', len(header)) + header + b''.join(blob for _, blob in blobs), 1)
+
+
+def unpack(data):
+    """还原 pack 打包的 (meta, arrays)；不是这个格式的数据（例如旧版本用pickle保存的）抛出 ValueError"""
+    data = zlib.decompress(data)
+    if not data.startswith(PACK_MAGIC):
+        raise ValueError('不支持的存储格式')
+    offset = len(PACK_MAGIC)
+    (header_size,) = struct.unpack_from('<I', data, offset)
+    offset += 4
+    header = json.loads(data[offset:offset + header_size])
+    offset += header_size
+
+    arrays = []
+    for kind, size in header['blobs']:
+        blob = data[offset:offset + size]
+        offset += size
+        arrays.append(blob if kind == 'bytes' else np.load(BytesIO(blob), allow_pickle=False))
+    return header['meta'], arrays
+
+
+def serialize_result(result_df):
+    """
+    把结果序列化为压缩后的字节串（按列整体序列化，不逐行序列化对象）
+    数值数组和拼接后的文本按二进制保存，object数组（文本类别、混合类型的列）的取值写在JSON头部中
+    """
+    compact = compact_result(result_df)
+    arrays = []
+    columns = []
+    for column, encoded in compact['columns'].items():
+        parts = []
+        for part in encoded[1:]:
+            if isinstance(part, np.ndarray) and part.dtype == object:
+                parts.append({'values': [plain_value(value) for value in part]})
+            else:
+                parts.append({'array': len(arrays)})
+                arrays.append(part)
+        columns.append([column, encoded[0], parts])
+    return pack({'length': compact['length'], 'columns': columns}, arrays)
+
+
+def deserialize_result(data):
+    """从 serialize_result 生成的字节串还原结果DataFrame"""
+    meta, arrays = unpack(data)
+    columns = {}
+    for column, kind, parts in meta['columns']:
+        columns[column] = (kind, *(
+            arrays[part['array']] if 'array' in part else np.array(part['values'], dtype=object)
+            for part in parts
+        ))
+    return restore_result({'length': meta['length'], 'columns': columns})
+
+
+def load_result(data):
+    """从存储中读出的数据还原结果；旧版本（pickle格式）保存的结果不再读取，按结果不存在处理"""
+    try:
+        return deserialize_result(data)
+    except ValueError:
+        return None
+
+
+def format_bytes(size):
+    return f'{size / 1024 / 1024:.1f}MB' if size >= 1024 * 1024 else f'{size / 1024:.1f}KB'
+
+
+def check_result_size(size, max_bytes):
+    """单个结果超过存储上限时拒绝保存：保存后会立即被清理，返回的 result_id 将无法使用"""
+    if max_bytes is not None and size > max_bytes:
+        raise ValueError(f'处理结果太大（{format_bytes(size)}），超过结果存储的上限（{format_bytes(max_bytes)}）')
+
+
+def make_artifact(data, modified=None):
+    """导出文件（xlsx、csv等）的缓存项：内容、ETag 和生成时间"""
+    return {
+        'data': data,
+        'etag': hashlib.sha256(data).hexdigest()[:32],
+        'modified': modified if modified is not None else time.time(),
+    }
+
+
+class MemoryResultStore:
+    """
+    进程内存储，结果以紧凑的列式表示保存（见 compact_result），并记录每个结果占用的内存大小
+    结果在 ttl 秒内没有被访问就过期；总大小超过 max_bytes 或数量超过 max_entries 时移除最久未访问的结果
+    """
+
+    def __init__(self, ttl=None, max_bytes=None, max_entries=None):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.jobs = {}  # job_id -> (更新时间, 任务状态)
+        self.lock = threading.Lock()
+        self.stats = Counter(evicted=0, expired=0)
+
+    def put(self, result_id, result_df):
+        compact = compact_result(result_df)
+        entry = {
+            'compact': compact,
+            'artifacts': {},
+            'size': result_size(compact),
+            'accessed': time.time(),
+        }
+        check_result_size(entry['size'], self.max_bytes)
+        with self.lock:
+            old = self.entries.pop(result_id, None)
+            if old is not None:
+                self.total_bytes -= old['size']
+            self.entries[result_id] = entry
+            self.total_bytes += entry['size']
+        self.sweep()
+
+    def get(self, result_id):
+        with self.lock:
+            result_data = self.entries.get(result_id)
+            if result_data is None or self.is_expired(result_data, time.time()):
+                return None
+            result_data['accessed'] = time.time()
+            self.entries.move_to_end(result_id)
+        return restore_result(result_data['compact'])
+
+    def __contains__(self, result_id):
+        with self.lock:
+            result_data = self.entries.get(result_id)
+            return result_data is not None and not self.is_expired(result_data, time.time())
+
+    def touch(self, result_id):
+        """结果未过期时更新访问时间并返回True"""
+        with self.lock:
+            result_data = self.entries.get(result_id)
+            if result_data is None or self.is_expired(result_data, time.time()):
+                return False
+            result_data['accessed'] = time.time()
+            self.entries.move_to_end(result_id)
+            return True
+
+    def get_artifact(self, result_id, name):
+        """取出结果对应的导出文件缓存，没有时返回None"""
+        with self.lock:
+            result_data = self.entries.get(result_id)
+            if result_data is None or self.is_expired(result_data, time.time()):
+                return None
+            result_data['accessed'] = time.time()
+            self.entries.move_to_end(result_id)
+            return result_data['artifacts'].get(name)
+
+    def put_artifact(self, result_id, name, data):
+        """
+        把导出文件和结果存在一起，大小计入该结果；
+        结果已不存在，或者加上导出文件后超过存储上限（会把结果本身清理掉）时只返回不缓存
+        """
+        artifact = make_artifact(data)
+        with self.lock:
+            result_data = self.entries.get(result_id)
+            if result_data is None:
+                return artifact
+            old = result_data['artifacts'].get(name)
+            size = result_data['size'] - (len(old['data']) if old is not None else 0) + len(data)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return artifact
+            result_data['artifacts'].pop(name, None)
+            if old is not None:
+                result_data['size'] -= len(old['data'])
+                self.total_bytes -= len(old['data'])
+            result_data['artifacts'][name] = artifact
+            result_data['size'] += len(data)
+            self.total_bytes += len(data)
+        self.sweep()
+        return artifact
+
+    def put_job(self, job_id, record):
+        """保存后台任务的状态（可以转换为JSON的字典）"""
+        with self.lock:
+            self.jobs[job_id] = (time.time(), record)
+
+    def get_job(self, job_id):
+        with self.lock:
+            item = self.jobs.get(job_id)
+        return item[1] if item is not None else None
+
+    def is_expired(self, entry, now):
+        return self.ttl is not None and entry['accessed'] < now - self.ttl
+
+    def sweep(self):
+        """删除过期的结果，再按最久未访问的顺序删除，直到总大小和数量都不超过上限；超过 ttl 没有更新的任务状态也删除"""
+        now = time.time()
+        with self.lock:
+            # entries按访问时间从旧到新排列，过期的结果都在最前面
+            while self.entries:
+                result_id, entry = next(iter(self.entries.items()))
+                if self.is_expired(entry, now):
+                    self.stats['expired'] += 1
+                elif ((self.max_bytes is not None and self.total_bytes > self.max_bytes)
+                      or (self.max_entries is not None and len(self.entries) > self.max_entries)):
+                    self.stats['evicted'] += 1
+                else:
+                    break
+                del self.entries[result_id]
+                self.total_bytes -= entry['size']
+
+            # 任务状态超过 ttl 没有更新就删除
+            if self.ttl is not None:
+                for job_id in [job_id for job_id, (updated, _) in self.jobs.items() if updated < now - self.ttl]:
+                    del self.jobs[job_id]
+
+    def info(self):
+        with self.lock:
+            return dict(self.stats, backend='memory', entries=len(self.entries), bytes=self.total_bytes,
+                        max_bytes=self.max_bytes, ttl=self.ttl)
+
+
+class SQLiteResultStore:
+    """
+    SQLite存储（WAL模式，多个进程可以同时读写）
+    结果在 ttl 秒内没有被访问就过期；总大小超过 max_bytes 时移除最久未访问的结果
+    """
+
+    def __init__(self, path, ttl, max_bytes):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.local = threading.local()
+        self.stats = Counter(evicted=0, expired=0)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        conn = self.connect()
+        conn.execute('PRAGMA journal_mode=WAL')
+        with conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                'result_id TEXT PRIMARY KEY, accessed REAL NOT NULL, size INTEGER NOT NULL, data BLOB NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS artifacts ('
+                'result_id TEXT NOT NULL, name TEXT NOT NULL, etag TEXT NOT NULL, modified REAL NOT NULL, '
+                'data BLOB NOT NULL, PRIMARY KEY (result_id, name))'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, updated REAL NOT NULL, data TEXT NOT NULL)'
+            )
+
+    def connect(self):
+        """每个线程使用自己的连接"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+        return conn
+
+    def put(self, result_id, result_df):
+        data = serialize_result(result_df)
+        check_result_size(len(data), self.max_bytes)
+        conn = self.connect()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO results (result_id, accessed, size, data) VALUES (?, ?, ?, ?)',
+                (result_id, time.time(), len(data), data)
+            )
+            conn.execute('DELETE FROM artifacts WHERE result_id = ?', (result_id,))
+        self.sweep()
+
+    def get(self, result_id):
+        conn = self.connect()
+        row = conn.execute(
+            'SELECT data FROM results WHERE result_id = ? AND accessed >= ?',
+            (result_id, time.time() - self.ttl)
+        ).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute('UPDATE results SET accessed = ? WHERE result_id = ?', (time.time(), result_id))
+        return load_result(row[0])
+
+    def __contains__(self, result_id):
+        row = self.connect().execute(
+            'SELECT 1 FROM results WHERE result_id = ? AND accessed >= ?',
+            (result_id, time.time() - self.ttl)
+        ).fetchone()
+        return row is not None
+
+    def touch(self, result_id):
+        """结果未过期时更新访问时间并返回True"""
+        now = time.time()
+        conn = self.connect()
+        with conn:
+            return conn.execute(
+                'UPDATE results SET accessed = ? WHERE result_id = ? AND accessed >= ?', (now, result_id, now - self.ttl)
+            ).rowcount > 0
+
+    def get_artifact(self, result_id, name):
+        """取出结果对应的导出文件缓存，没有时返回None"""
+        conn = self.connect()
+        row = conn.execute(
+            'SELECT a.data, a.etag, a.modified FROM artifacts a JOIN results r ON r.result_id = a.result_id '
+            'WHERE a.result_id = ? AND a.name = ? AND r.accessed >= ?',
+            (result_id, name, time.time() - self.ttl)
+        ).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute('UPDATE results SET accessed = ? WHERE result_id = ?', (time.time(), result_id))
+        return {'data': row[0], 'etag': row[1], 'modified': row[2]}
+
+    def put_artifact(self, result_id, name, data):
+        """
+        把导出文件和结果存在一起，大小计入该结果；
+        结果已不存在，或者加上导出文件后超过存储上限（会把结果本身清理掉）时只返回不缓存
+        """
+        artifact = make_artifact(data)
+        conn = self.connect()
+        with conn:
+            row = conn.execute('SELECT size FROM results WHERE result_id = ?', (result_id,)).fetchone()
+            if row is None:
+                return artifact
+            old = conn.execute(
+                'SELECT LENGTH(data) FROM artifacts WHERE result_id = ? AND name = ?', (result_id, name)
+            ).fetchone()
+            if row[0] - (old[0] if old else 0) + len(data) > self.max_bytes:
+                return artifact
+            conn.execute(
+                'INSERT OR REPLACE INTO artifacts (result_id, name, etag, modified, data) VALUES (?, ?, ?, ?, ?)',
+                (result_id, name, artifact['etag'], artifact['modified'], data)
+            )
+            conn.execute(
+                'UPDATE results SET size = size + ? WHERE result_id = ?',
+                (len(data) - (old[0] if old else 0), result_id)
+            )
+        self.sweep()
+        return artifact
+
+    def put_job(self, job_id, record):
+        """保存后台任务的状态（可以转换为JSON的字典）"""
+        conn = self.connect()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO jobs (job_id, updated, data) VALUES (?, ?, ?)',
+                (job_id, time.time(), json.dumps(record, ensure_ascii=False))
+            )
+
+    def get_job(self, job_id):
+        row = self.connect().execute('SELECT data FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def sweep(self):
+        """删除过期的结果，再按最久未访问的顺序删除，直到总大小不超过 max_bytes；超过 ttl 没有更新的任务状态也删除"""
+        conn = self.connect()
+        with conn:
+            conn.execute('DELETE FROM jobs WHERE updated < ?', (time.time() - self.ttl,))
+            expired = conn.execute('DELETE FROM results WHERE accessed < ?', (time.time() - self.ttl,)).rowcount
+            self.stats['expired'] += expired
+
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+            evicted = []
+            rows = conn.execute('SELECT result_id, size FROM results ORDER BY accessed') if total > self.max_bytes else []
+            for result_id, size in rows:
+                if total <= self.max_bytes:
+                    break
+                evicted.append((result_id,))
+                total -= size
+            conn.executemany('DELETE FROM results WHERE result_id = ?', evicted)
+            self.stats['evicted'] += len(evicted)
+
+        # 删除已经不存在的结果的导出文件
+        with conn:
+            conn.execute('DELETE FROM artifacts WHERE result_id NOT IN (SELECT result_id FROM results)')
+
+    def info(self):
+        entries, total = self.connect().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results'
+        ).fetchone()
+        return dict(self.stats, backend='sqlite', entries=entries, bytes=total, max_bytes=self.max_bytes)
+
+
+class DirectoryResultStore:
+    """
+    磁盘目录存储，每个结果一个 <result_id>.bin 文件，文件修改时间即最后访问时间，
+    导出文件缓存为同名的 <result_id>.<名称>.art 文件，后台任务的状态为 <job_id>.job 文件（JSON）
+    结果在 ttl 秒内没有被访问就过期；总大小超过 max_bytes 时移除最久未访问的结果
+    """
+
+    def __init__(self, path, ttl, max_bytes):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = Counter(evicted=0, expired=0)
+        os.makedirs(path, mode=0o700, exist_ok=True)
+
+    def file_path(self, result_id, name=None):
+        if not RESULT_ID_PATTERN.match(result_id):
+            return None
+        if name is None:
+            return os.path.join(self.path, f'{result_id}.bin')
+        return os.path.join(self.path, f'{result_id}.{name}.art')
+
+    def write_file(self, path, data):
+        """先写到同一目录下的临时文件再替换，其他进程不会读到写了一半的文件"""
+        fd, temp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def put(self, result_id, result_df):
+        path = self.file_path(result_id)
+        if path is None:
+            raise ValueError(f'无效的result_id: {result_id}')
+        data = serialize_result(result_df)
+        check_result_size(len(data), self.max_bytes)
+        self.write_file(path, data)
+        self.sweep()
+
+    def touch(self, result_id):
+        """结果未过期时更新访问时间并返回True"""
+        path = self.file_path(result_id)
+        try:
+            if path is None or os.path.getmtime(path) < time.time() - self.ttl:
+                return False
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def get(self, result_id):
+        if not self.touch(result_id):
+            return None
+        try:
+            with open(self.file_path(result_id), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        return load_result(data)
+
+    def __contains__(self, result_id):
+        path = self.file_path(result_id)
+        try:
+            return path is not None and os.path.getmtime(path) >= time.time() - self.ttl
+        except FileNotFoundError:
+            return False
+
+    def get_artifact(self, result_id, name):
+        """取出结果对应的导出文件缓存，没有时返回None"""
+        if not self.touch(result_id):
+            return None
+        path = self.file_path(result_id, name)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            modified = os.path.getmtime(path)
+        except FileNotFoundError:
+            return None
+        return make_artifact(data, modified)
+
+    def put_artifact(self, result_id, name, data):
+        """
+        把导出文件和结果存在一起，大小计入该结果；
+        结果已不存在，或者加上导出文件后超过存储上限（会把结果本身清理掉）时只返回不缓存
+        """
+        artifact = make_artifact(data)
+        if result_id in self and self.result_files_size(result_id, name) + len(data) <= self.max_bytes:
+            self.write_file(self.file_path(result_id, name), data)
+            self.sweep()
+        return artifact
+
+    def result_files_size(self, result_id, exclude_name=None):
+        """结果文件和它的导出文件的总大小，不包括名称为 exclude_name 的导出文件"""
+        excluded = os.path.basename(self.file_path(result_id, exclude_name)) if exclude_name else None
+        size = 0
+        for entry in os.scandir(self.path):
+            if entry.name.startswith(f'{result_id}.') and entry.name != excluded:
+                try:
+                    size += entry.stat().st_size
+                except FileNotFoundError:
+                    pass
+        return size
+
+    def put_job(self, job_id, record):
+        """保存后台任务的状态（可以转换为JSON的字典）"""
+        if not RESULT_ID_PATTERN.match(job_id):
+            raise ValueError(f'无效的job_id: {job_id}')
+        self.write_file(os.path.join(self.path, f'{job_id}.job'),
+                        json.dumps(record, ensure_ascii=False).encode('utf-8'))
+
+    def get_job(self, job_id):
+        if not RESULT_ID_PATTERN.match(job_id):
+            return None
+        try:
+            with open(os.path.join(self.path, f'{job_id}.job'), 'rb') as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return None
+
+    def list_results(self):
+        """
+        返回 (最后访问时间, 总大小, 文件列表) 列表，按访问时间从旧到新排序
+        总大小包括结果文件和它的导出文件；找不到结果文件的导出文件单独作为已过期的项目返回
+        """
+        results = {}
+        artifacts = {}
+        for entry in os.scandir(self.path):
+            result_id, _, suffix = entry.name.partition('.')
+            if not (suffix == 'bin' or suffix.endswith('.art')):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if suffix == 'bin':
+                results[result_id] = (stat.st_mtime, stat.st_size, entry.path)
+            else:
+                artifacts.setdefault(result_id, []).append((stat.st_size, entry.path))
+
+        items = []
+        for result_id, (mtime, size, path) in results.items():
+            extra = artifacts.pop(result_id, [])
+            items.append((mtime, size + sum(s for s, _ in extra), [path] + [p for _, p in extra]))
+        for extra in artifacts.values():
+            items.append((0, sum(s for s, _ in extra), [p for _, p in extra]))
+        items.sort()
+        return items
+
+    def sweep(self):
+        """删除过期的结果，再按最久未访问的顺序删除，直到总大小不超过 max_bytes；超过 ttl 没有更新的任务状态也删除"""
+        deadline = time.time() - self.ttl
+        for entry in os.scandir(self.path):
+            try:
+                if entry.name.endswith('.job') and entry.stat().st_mtime < deadline:
+                    os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+
+        items = self.list_results()
+        total = sum(size for _, size, _ in items)
+        for mtime, size, paths in items:
+            if mtime >= deadline and total <= self.max_bytes:
+                break
+            for path in paths:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            self.stats['expired' if mtime < deadline else 'evicted'] += 1
+
+    def info(self):
+        items = self.list_results()
+        return dict(self.stats, backend='directory', entries=len(items),
+                    bytes=sum(size for _, size, _ in items), max_bytes=self.max_bytes)
+
+
+def private_directory():
+    """
+    没有指定存储位置时使用的目录：临时目录下只有当前用户可以访问的 count_results
+    这个目录已经存在，但不是目录（例如符号链接）、不属于当前用户或者其他用户可以访问时拒绝使用
+    """
+    directory = os.path.join(tempfile.gettempdir(), 'count_results')
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or (
+            hasattr(os, 'getuid') and (info.st_uid != os.getuid() or info.st_mode & 0o077)):
+        raise ValueError(f'结果存储目录 {directory} 不属于当前用户或其他用户可以访问，请用 RESULT_STORE_PATH 指定存储位置')
+    return directory
+
+
+def create_result_store(backend, path=None, ttl=24 * 3600, max_bytes=512 * 1024 * 1024, max_entries=None):
+    """按名称创建结果存储：memory、sqlite 或 directory"""
+    if backend == 'memory':
+        return MemoryResultStore(ttl, max_bytes, max_entries)
+    if backend == 'sqlite':
+        return SQLiteResultStore(path or os.path.join(private_directory(), 'results.sqlite3'), ttl, max_bytes)
+    if backend == 'directory':
+        return DirectoryResultStore(path or private_directory(), ttl, max_bytes)
+    raise ValueError(f'不支持的结果存储: {backend}')
+
+
+def start_sweeper(store, interval):
+    """启动后台清理线程，每隔 interval 秒清理一次过期和超出上限的结果"""
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                store.sweep()
+            except Exception:
+                # 清理失败不影响服务，下一轮再试
+                pass
+
+    thread = threading.Thread(target=run, name='result-store-sweeper', daemon=True)
+    thread.start()
+    return stop